@@ -1,28 +1,17 @@
 #!/usr/bin/env python
 
 import argparse
-import os
 import os.path
+import sys
 
-from bs4 import BeautifulSoup
 import requests
 
+# Make otdet importable when run from a checkout
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
 
-def post_filter(tag):
-    """Filter tag containing a post."""
+from otdet.crawler import save_posts
+from otdet.sites import ArchLinux
 
-    def only_one_postmsg_class(attr):
-        if isinstance(attr, str):
-            return attr == 'postmsg'
-        return len(attr) == 1 and attr[0] == 'postmsg'
-
-    return tag.name == 'div' and tag.has_attr('class') and\
-        only_one_postmsg_class(tag['class'])
-
-
-def text_filter(tag):
-    """Filter tag containing text."""
-    return tag.name == 'p' and not tag.has_attr('class')
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Scrape Arch Linux forum')
@@ -34,8 +23,8 @@ if __name__ == '__main__':
                         help='Start post number')
     args = parser.parse_args()
 
-    url = 'https://bbs.archlinux.org/viewtopic.php'
-    payload = {'id': args.id, 'p': args.page}
+    site = ArchLinux()
+    url, payload = site.page_url(args.id, args.page)
     r = requests.get(url, params=payload)
     if r.status_code == 200:
         # Create save directory
@@ -43,14 +32,4 @@ if __name__ == '__main__':
             savedir = os.path.join(args.outdir, args.id)
         else:
             savedir = args.id
-        os.makedirs(savedir, exist_ok=True)
-
-        soup = BeautifulSoup(r.text)
-        for i, post in enumerate(soup.find_all(post_filter)):
-            num = i + args.number
-            savefile = os.path.join(savedir, 'post-{}.txt'.format(num))
-            with open(savefile, 'w') as fout:
-                pstr = [p.stripped_strings for p in post.descendants
-                        if text_filter(p)]
-                for text in pstr:
-                    print('\n'.join(text), file=fout)
+        save_posts(site.parse(r.text), savedir, start=args.number)
@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+
+import argparse
+import os.path
+import sys
+import timeit
+
+# Make otdet importable when run from a checkout
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from otdet.sites import BACKENDS, SITES
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare the speed of post '
+                                     'extraction backends on saved pages')
+    parser.add_argument('site', type=str, choices=sorted(SITES),
+                        help='Forum site of the pages')
+    parser.add_argument('pages', type=str, nargs='+',
+                        help='Saved HTML page files')
+    parser.add_argument('-n', '--number', type=int, default=20,
+                        help='Number of times each page is parsed')
+    args = parser.parse_args()
+
+    pages = []
+    for filename in args.pages:
+        with open(filename, encoding='utf-8') as f:
+            pages.append(f.read())
+
+    times, results = {}, {}
+    for backend in BACKENDS:
+        site = SITES[args.site](backend=backend)
+        results[backend] = [site.parse(html) for html in pages]
+        times[backend] = timeit.timeit(
+            lambda: [site.parse(html) for html in pages], number=args.number)
+    num_posts = sum(len(posts) for posts in results['bs4'])
+    for backend in BACKENDS:
+        print('{}: {:.2f} ms per page'.format(
+            backend, 1000 * times[backend] / args.number / len(pages)))
+    print('speedup: {:.1f}x on {} pages of {} posts'.format(
+        times['bs4'] / times['lxml'], len(pages), num_posts))
+    if results['lxml'] != results['bs4']:
+        print('lxml and bs4 extract different texts', file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,24 @@
+#!/usr/bin/env python
+
+import argparse
+import os.path
+import sys
+
+from nltk.corpus import cmudict
+
+# Make otdet importable when run from a checkout
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from otdet.syllables import DEFAULT_PATH, SyllableTable
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build the syllable lookup '
+                                     'table from CMU pronouncing dictionary')
+    parser.add_argument('-o', '--outdir', type=str, default=DEFAULT_PATH,
+                        help='Directory in which the table will be stored')
+    args = parser.parse_args()
+
+    table = SyllableTable.from_dict(cmudict.dict())
+    table.save(args.outdir)
+    print("Stored {} words in '{}'".format(len(table), args.outdir))
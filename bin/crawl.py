@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+
+import argparse
+import os.path
+import sys
+
+# Make otdet importable when run from a checkout
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from otdet.crawler import Crawler, Job, save_numbered_posts
+from otdet.journal import CrawlJournal
+from otdet.sites import SITES
+
+
+def parse_pages(value):
+    """Parse a page range like '3' or '1-5' into a list of page numbers."""
+    first, _, last = value.partition('-')
+    return list(range(int(first), int(last or first) + 1))
+
+
+def read_jobs(lines, base_url=None):
+    """Parse jobs from lines of 'site thread_id [pages]'."""
+    jobs = []
+    for line in lines:
+        fields = line.split()
+        if not fields or fields[0].startswith('#'):
+            continue
+        site = SITES[fields[0]](base_url)
+        pages = parse_pages(fields[2]) if len(fields) > 2 else [1]
+        jobs.append(Job(site, fields[1], pages))
+    return jobs
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Scrape many forum threads '
+                                     'concurrently')
+    parser.add_argument('site', type=str, nargs='?', choices=sorted(SITES),
+                        help='Forum site')
+    parser.add_argument('id', type=str, nargs='*', help='Thread ID')
+    parser.add_argument('-p', '--pages', type=str, default='1',
+                        help='Page number or range of page numbers, '
+                        'e.g. 1-5')
+    parser.add_argument('-i', '--input', type=argparse.FileType('r'),
+                        help="File of jobs, one 'site thread_id [pages]' "
+                        "per line")
+    parser.add_argument('-o', '--outdir', type=str, default='.',
+                        help='Output directory')
+    parser.add_argument('-c', '--concurrency', type=int, default=4,
+                        help='Max number of concurrent requests per host')
+    parser.add_argument('-r', '--rate', type=float, default=None,
+                        help='Max number of requests per second per host')
+    parser.add_argument('--retries', type=int, default=3,
+                        help='Number of retries of a failed request')
+    parser.add_argument('--base-url', type=str, default=None,
+                        help='Base URL of a mirror of the site')
+    parser.add_argument('-j', '--journal', type=str, default=None,
+                        help='Journal file of fetched pages and saved posts, '
+                        'to fetch and save only new ones')
+    parser.add_argument('--revalidate', action='store_true',
+                        help='Request all journaled pages again, not just '
+                        'the last page of each thread')
+    args = parser.parse_args()
+
+    jobs = []
+    if args.site is not None:
+        site = SITES[args.site](args.base_url)
+        pages = parse_pages(args.pages)
+        jobs.extend(Job(site, thread_id, pages) for thread_id in args.id)
+    if args.input is not None:
+        jobs.extend(read_jobs(args.input, args.base_url))
+    if not jobs:
+        parser.error('no thread to scrape')
+
+    def save(job, posts):
+        savedir = os.path.join(args.outdir, job.thread_id)
+        save_numbered_posts(posts, savedir)
+        print('{} {}: {} posts'.format(job.site.name, job.thread_id,
+                                       len(posts)), file=sys.stderr)
+
+    journal = None if args.journal is None else CrawlJournal(args.journal)
+    crawler = Crawler(concurrency=args.concurrency, rate=args.rate,
+                      retries=args.retries, journal=journal,
+                      revalidate=args.revalidate)
+    crawler.run(jobs, callback=save)
@@ -1,17 +1,17 @@
 #!/usr/bin/env python
 
 import argparse
-import os
 import os.path
+import sys
 
-from bs4 import BeautifulSoup
 import requests
 
+# Make otdet importable when run from a checkout
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from otdet.crawler import save_posts
+from otdet.sites import MovieForums
 
-def post_filter(tag):
-    return tag.name == 'div' and tag.has_attr('id') and \
-        tag['id'].startswith('post_message_') and \
-        'ad' not in tag['id']
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Scrape Movieforums forum')
@@ -23,8 +23,8 @@ if __name__ == '__main__':
                         help='Start post number')
     args = parser.parse_args()
 
-    url = 'http://www.movieforums.com/community/showthread.php'
-    payload = {'t': args.id, 'page': args.page}
+    site = MovieForums()
+    url, payload = site.page_url(args.id, args.page)
     r = requests.get(url, params=payload)
     if r.status_code == 200:
         # Create save directory
@@ -32,11 +32,4 @@ if __name__ == '__main__':
             savedir = os.path.join(args.outdir, args.id)
         else:
             savedir = args.id
-        os.makedirs(savedir, exist_ok=True)
-
-        soup = BeautifulSoup(r.text)
-        for i, post in enumerate(soup.find_all(post_filter)):
-            num = i + args.number
-            savefile = os.path.join(savedir, 'post-{}.txt'.format(num))
-            with open(savefile, 'w') as fout:
-                print('\n'.join(list(post.stripped_strings)), file=fout)
+        save_posts(site.parse(r.text), savedir, start=args.number)
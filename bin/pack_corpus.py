@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+
+import argparse
+from glob import glob
+import os
+import os.path
+import sys
+
+# Make otdet importable when run from a checkout
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from otdet.pack import EXTENSION, pack_directory
+
+
+def thread_dirs(dirname):
+    """Return the thread directories in a thread or forum directory.
+
+    A forum directory, such as the output directory of the scrapers, has a
+    subdirectory of post files for each thread.
+    """
+    if glob(os.path.join(dirname, '*.txt')):
+        return [dirname]
+    return sorted(path for path in glob(os.path.join(dirname, '*'))
+                  if os.path.isdir(path) and
+                  glob(os.path.join(path, '*.txt')))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Pack thread directories '
+                                     'of post files into pack files')
+    parser.add_argument('dirname', type=str, nargs='+',
+                        help='Thread directory, or forum directory of '
+                        'thread directories')
+    parser.add_argument('-o', '--outdir', type=str, default=None,
+                        help='Output directory (default: next to each '
+                        'thread directory)')
+    parser.add_argument('-z', '--compress', action='store_true',
+                        help='Compress each post with zlib')
+    args = parser.parse_args()
+
+    if args.outdir is not None:
+        os.makedirs(args.outdir, exist_ok=True)
+    for dirname in args.dirname:
+        for thread_dir in thread_dirs(dirname):
+            thread_dir = os.path.normpath(thread_dir)
+            filename = thread_dir + EXTENSION
+            if args.outdir is not None:
+                filename = os.path.join(args.outdir,
+                                        os.path.basename(filename))
+            pack_directory(thread_dir, filename, compress=args.compress)
+            print('{} -> {}'.format(thread_dir, filename), file=sys.stderr)
@@ -1,19 +1,17 @@
 #!/usr/bin/env python
 
 import argparse
-import os
 import os.path
+import sys
 
-from bs4 import BeautifulSoup
 import requests
 
+# Make otdet importable when run from a checkout
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from otdet.crawler import save_posts
+from otdet.sites import ReligiousForums
 
-def post_filter(tag):
-    if tag.name != 'blockquote':
-        return False
-    if not tag.has_attr('class'):
-        return False
-    return isinstance(tag['class'], list) and 'messageText' in tag['class']
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Scrape Religiousforums '
@@ -26,20 +24,13 @@ if __name__ == '__main__':
                         help='Start post number')
     args = parser.parse_args()
 
-    url = 'https://www.religiousforums.com/threads/{}/page-{}'
-    url = url.format(args.id, args.page)
-    r = requests.get(url)
+    site = ReligiousForums()
+    url, payload = site.page_url(args.id, args.page)
+    r = requests.get(url, params=payload)
     if r.status_code == 200:
         # Create save directory
         if args.outdir is not None:
             savedir = os.path.join(args.outdir, args.id)
         else:
             savedir = args.id
-        os.makedirs(savedir, exist_ok=True)
-
-        soup = BeautifulSoup(r.text)
-        for i, post in enumerate(soup.find_all(post_filter)):
-            num = i + args.number
-            savefile = os.path.join(savedir, 'post-{}.txt'.format(num))
-            with open(savefile, 'w') as fout:
-                print('\n'.join(list(post.stripped_strings)), file=fout)
+        save_posts(site.parse(r.text), savedir, start=args.number)
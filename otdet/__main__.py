@@ -0,0 +1,6 @@
+import sys
+
+from otdet.cli import main
+
+
+sys.exit(main())
@@ -0,0 +1,96 @@
+"""
+Persistent cache of document features.
+"""
+
+import hashlib
+import os
+import pickle
+import sqlite3
+
+
+class FeatureCache:
+    """On-disk cache of per-document features keyed by content hash.
+
+    Features are pickled into an SQLite database, so they persist across
+    runs and can be shared by several processes. Each key is the hash of
+    a namespace, which identifies the extractor and its parameters, and
+    the document content.
+    """
+
+    BATCH_SIZE = 500    # Max number of keys in a single query
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._conn = None
+        self._pid = None
+        # Connections inherited through fork, which must not even be closed
+        self._inherited = []
+
+    def __getstate__(self):
+        # Connections cannot be shared by processes; reconnect lazily
+        state = self.__dict__.copy()
+        state['_conn'] = None
+        state['_inherited'] = []
+        return state
+
+    @property
+    def connection(self):
+        """Return the database connection, creating the table if needed.
+
+        A process forked after the connection was opened opens its own.
+        """
+        if self._conn is not None and self._pid != os.getpid():
+            self._inherited.append(self._conn)
+            self._conn = None
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.filename, timeout=60)
+            self._pid = os.getpid()
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('CREATE TABLE IF NOT EXISTS features '
+                               '(key TEXT PRIMARY KEY, value BLOB)')
+        return self._conn
+
+    @staticmethod
+    def key(namespace, document):
+        """Return the cache key of a document in the given namespace."""
+        content = '{}\0{}'.format(namespace, document).encode('utf-8')
+        return hashlib.sha1(content).hexdigest()
+
+    def get_many(self, keys):
+        """Return a dict of the cached features of the given keys."""
+        keys = list(keys)
+        res = {}
+        for i in range(0, len(keys), self.BATCH_SIZE):
+            batch = keys[i:i+self.BATCH_SIZE]
+            query = 'SELECT key, value FROM features WHERE key IN ({})'
+            query = query.format(','.join('?'*len(batch)))
+            for key, value in self.connection.execute(query, batch):
+                res[key] = pickle.loads(value)
+        return res
+
+    def set_many(self, items):
+        """Store (key, features) pairs in the cache."""
+        rows = [(key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+                for key, value in items]
+        with self.connection:
+            self.connection.executemany('INSERT OR REPLACE INTO features '
+                                        'VALUES (?, ?)', rows)
+
+    def features(self, namespace, documents, func):
+        """Return the features of each document.
+
+        Features not yet cached are computed in a single call to func, which
+        takes a list of documents and returns the list of their features,
+        and then stored.
+        """
+        keys = [self.key(namespace, doc) for doc in documents]
+        cached = self.get_many(set(keys))
+        missing = {}
+        for key, doc in zip(keys, documents):
+            if key not in cached:
+                missing[key] = doc
+        if missing:
+            computed = list(zip(missing, func(list(missing.values()))))
+            self.set_many(computed)
+            cached.update(computed)
+        return [cached[key] for key in keys]
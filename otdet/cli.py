@@ -0,0 +1,219 @@
+"""
+Command line interface for scoring threads.
+"""
+
+import argparse
+import itertools as it
+import json
+import math
+import sys
+
+from otdet.cache import FeatureCache
+from otdet.detector import OOTDetector
+from otdet.evaluation import rank_posts
+from otdet.feature_extraction import CountVectorizerWrapper, \
+    ReadabilityMeasures
+
+
+def parse_max_features(value):
+    """Parse max number of vocabs, either a count or a fraction."""
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return float(value)
+
+
+def make_detector(feature='unigram', max_features=None, n_jobs=1,
+                  cache=None):
+    """Return an OOTDetector using the given text features."""
+    if feature == 'unigram':
+        extractor = CountVectorizerWrapper(input='content',
+                                           stop_words='english',
+                                           max_features=max_features,
+                                           sparse=True)
+    elif feature == 'readability':
+        extractor = ReadabilityMeasures(n_jobs=n_jobs)
+    else:
+        raise Exception("Unsupported feature: '{}'".format(feature))
+    return OOTDetector(extractor=extractor, n_jobs=n_jobs, cache=cache)
+
+
+def read_threads(lines):
+    """Parse threads from lines of JSON, yielding (id, posts) pairs.
+
+    A line is either a whole thread, i.e. a list of posts or an object with
+    a list of posts under "posts" and optionally an "id" (the line number by
+    default), or a single post, i.e. an object with its "text" and the
+    "thread" it belongs to. Consecutive posts of the same thread are
+    grouped together. Blank lines are skipped. Lines are read lazily, at
+    most one line beyond the current thread.
+    """
+    def records():
+        for lineno, line in enumerate(lines, 1):
+            if line.strip():
+                yield lineno, json.loads(line)
+
+    def thread_key(record):
+        lineno, obj = record
+        if isinstance(obj, dict) and 'text' in obj:
+            return True, obj.get('thread')
+        return False, lineno
+
+    for (is_post, key), group in it.groupby(records(), thread_key):
+        if is_post:
+            yield key, [obj['text'] for _, obj in group]
+        else:
+            lineno, obj = next(group)
+            if isinstance(obj, list):
+                yield lineno, obj
+            else:
+                yield obj.get('id', lineno), obj['posts']
+
+
+def rank(scores, top=None):
+    """Return indices of posts from the most off-topic, ties by position."""
+    return rank_posts(scores)[:top]
+
+
+def ranking(scores, top=None):
+    """Return the ranked posts of a thread with their scores as dicts."""
+    return [{'post': int(i),
+             'score': None if math.isnan(scores[i]) else float(scores[i])}
+            for i in rank(scores, top)]
+
+
+def score(threads, detector, method='clust_dist', metric='euclidean',
+          batch_size=100, top=None):
+    """Score threads lazily, yielding a ranked result of each thread.
+
+    Threads are (id, posts) pairs and are scored `batch_size` at a time,
+    so at most that many threads are held in memory. A thread that cannot
+    be scored, e.g. one with only stop words, yields an "error" instead of
+    a ranking.
+    """
+    threads = iter(threads)
+    while True:
+        batch = list(it.islice(threads, batch_size))
+        if not batch:
+            break
+        try:
+            all_scores = detector.score_threads(
+                [posts for _, posts in batch], method, metric)
+        except ValueError:
+            # Find out which threads fail by scoring them one by one
+            all_scores = []
+            for _, posts in batch:
+                try:
+                    all_scores.append(detector.score_threads(
+                        [posts], method, metric)[0])
+                except ValueError as e:
+                    all_scores.append(e)
+        for (thread_id, _), scores in zip(batch, all_scores):
+            if isinstance(scores, ValueError):
+                yield {'id': thread_id, 'error': str(scores)}
+            else:
+                yield {'id': thread_id, 'ranking': ranking(scores, top)}
+
+
+def add_detector_arguments(parser):
+    parser.add_argument('-a', '--method', type=str, default='clust_dist',
+                        choices=OOTDetector.METHODS,
+                        help='OOT post detection method to use')
+    parser.add_argument('-d', '--metric', type=str, default='euclidean',
+                        choices=['euclidean', 'cityblock', 'cosine',
+                                 'correlation'],
+                        help='Distance metric to use')
+    parser.add_argument('-f', '--feature', type=str, default='unigram',
+                        choices=['unigram', 'readability'],
+                        help='Text features to be used')
+    parser.add_argument('--max-features', type=str, default=None,
+                        help='Max number of vocabs (only for unigram feature)')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='Number of work processes')
+    parser.add_argument('--feature-cache', type=str, default=None,
+                        help='SQLite file caching document features '
+                        'across runs')
+
+
+def detector_from_args(args):
+    cache = None
+    if args.feature_cache is not None:
+        cache = FeatureCache(args.feature_cache)
+    return make_detector(args.feature, parse_max_features(args.max_features),
+                         n_jobs=args.jobs, cache=cache)
+
+
+def add_score_parser(subparsers):
+    parser = subparsers.add_parser('score', help='Rank posts of threads '
+                                   'read as JSON lines')
+    parser.add_argument('-i', '--input', type=argparse.FileType('r'),
+                        default=sys.stdin, help='JSON lines file of threads '
+                        '(default: standard input)')
+    parser.add_argument('-o', '--output', type=argparse.FileType('w'),
+                        default=sys.stdout, help='Where to write the ranked '
+                        'posts as JSON lines (default: standard output)')
+    add_detector_arguments(parser)
+    parser.add_argument('-t', '--top', type=int, default=None,
+                        help='Only output the top N posts of each thread')
+    parser.add_argument('-b', '--batch-size', type=int, default=100,
+                        help='Number of threads scored at once')
+    parser.set_defaults(func=run_score)
+
+
+def run_score(args):
+    detector = detector_from_args(args)
+    threads = read_threads(args.input)
+    results = score(threads, detector, args.method, args.metric,
+                    batch_size=args.batch_size, top=args.top)
+    for result in results:
+        print(json.dumps(result), file=args.output)
+        args.output.flush()
+
+
+def add_serve_parser(subparsers):
+    parser = subparsers.add_parser('serve', help='Serve thread scoring '
+                                   'over HTTP')
+    parser.add_argument('--host', type=str, default='127.0.0.1',
+                        help='Address to listen on')
+    parser.add_argument('-p', '--port', type=int, default=8000,
+                        help='Port to listen on')
+    add_detector_arguments(parser)
+    parser.add_argument('--max-batch', type=int, default=64,
+                        help='Max number of threads scored at once')
+    parser.add_argument('--max-delay', type=float, default=0.005,
+                        help='Max seconds to wait for more threads to batch')
+    parser.set_defaults(func=run_serve)
+
+
+def run_serve(args):
+    from otdet.server import ScoringServer, ScoringService
+    service = ScoringService(detector_from_args(args), args.method,
+                             args.metric, max_batch=args.max_batch,
+                             max_delay=args.max_delay)
+    service.warm_up()
+    service.start()
+    server = ScoringServer((args.host, args.port), service)
+    print('Serving on {}:{}'.format(*server.server_address), file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='otdet', description='Out-of-topic '
+                                     'post detection')
+    subparsers = parser.add_subparsers(dest='command')
+    add_score_parser(subparsers)
+    add_serve_parser(subparsers)
+    args = parser.parse_args(argv)
+    if args.command is None:
+        parser.print_help()
+        return 2
+    args.func(args)
+    return 0
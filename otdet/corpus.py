@@ -0,0 +1,71 @@
+"""
+Corpus of forum threads, each stored as a directory of post files or as a
+pack file.
+"""
+
+import os.path
+
+from otdet.pack import is_pack, PackedThread
+from otdet.util import PostIndex
+
+
+class Corpus:
+    """In-memory store of thread posts, reading each directory only once.
+
+    The posts of a thread are kept in an immutable tuple ordered by post
+    number, so a corpus can be shared by many experiment settings and,
+    through fork, by worker processes without copying. The posts of a
+    thread are read, or decoded from a pack file, only as far as they are
+    asked for.
+    """
+
+    def __init__(self):
+        self._threads = {}
+        # Pack files or post filenames of threads not yet read in full
+        self._pending = {}
+
+    def __contains__(self, dirname):
+        return os.path.normpath(dirname) in self._threads
+
+    def __len__(self):
+        return len(self._threads)
+
+    def load(self, dirname):
+        """Read all posts of a thread directory unless already read.
+
+        dirname may also be a pack file.
+        """
+        return self.posts(dirname)
+
+    def posts(self, dirname, k=None):
+        """Return the first k posts of a thread (all posts if k is None)."""
+        if k is not None and k < 0:
+            raise Exception('k should be non-negative')
+        key = os.path.normpath(dirname)
+        if key not in self._threads:
+            self._threads[key] = ()
+            if is_pack(dirname):
+                self._pending[key] = PackedThread(dirname)
+            else:
+                self._pending[key] = PostIndex.from_dir(dirname).filenames
+        posts = self._threads[key]
+        pending = self._pending.get(key)
+        if pending is not None:
+            stop = len(pending) if k is None else min(k, len(pending))
+            if len(posts) < stop:
+                posts += tuple(self._read(pending, i)
+                               for i in range(len(posts), stop))
+                self._threads[key] = posts
+            if len(posts) == len(pending):
+                if isinstance(pending, PackedThread):
+                    pending.close()
+                del self._pending[key]
+        return posts[:k]
+
+    @staticmethod
+    def _read(pending, i):
+        """Return post i of a pack file or of a tuple of post filenames."""
+        if isinstance(pending, PackedThread):
+            return pending[i]
+        with open(pending[i]) as f:
+            return f.read()
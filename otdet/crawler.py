@@ -0,0 +1,205 @@
+"""
+Concurrent crawler of forum threads.
+"""
+
+import asyncio
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import os
+import os.path
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from otdet.journal import CrawlJournal
+
+
+Job = namedtuple('Job', ['site', 'thread_id', 'pages'])
+Post = namedtuple('Post', ['number', 'text'])
+
+
+def save_numbered_posts(posts, savedir):
+    """Save (number, text) posts to numbered post files in a directory."""
+    os.makedirs(savedir, exist_ok=True)
+    for number, text in posts:
+        savefile = os.path.join(savedir, 'post-{}.txt'.format(number))
+        with open(savefile, 'w') as fout:
+            fout.write(text)
+
+
+def save_posts(posts, savedir, start=0):
+    """Save each post text to a numbered post file in a directory."""
+    save_numbered_posts(enumerate(posts, start), savedir)
+
+
+class HostLimiter:
+    """Limit the concurrent requests and request rate to a host."""
+
+    def __init__(self, concurrency, rate=None):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.interval = 0 if rate is None else 1 / rate
+        self._lock = asyncio.Lock()
+        self._next = 0
+
+    async def wait(self):
+        """Wait until the rate limit allows another request."""
+        async with self._lock:
+            delay = self._next - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._next = time.monotonic() + self.interval
+
+
+class Crawler:
+    """Fetch thread pages of forum sites concurrently.
+
+    Pages are fetched by blocking requests in a thread pool driven by an
+    asyncio event loop, with one pooled session per host. At most
+    `concurrency` requests are sent to a host at once, and at most `rate`
+    per second if given. A failed request, i.e. a connection error or a
+    server error status, is retried up to `retries` times with exponential
+    backoff. Pages with any other status than 200 are skipped, like the
+    scraper scripts do.
+
+    Posts of a thread are numbered from 0 in page order, unless a
+    CrawlJournal is given. Then only new posts are returned, numbered after
+    the posts saved by earlier crawls. Pages already fetched before the last
+    known page of a thread are skipped, unless `revalidate` is true, and the
+    others are requested conditionally on their ETag or Last-Modified date.
+    Unchanged pages are not parsed.
+    """
+
+    RETRY_STATUS = [429, 500, 502, 503, 504]
+
+    def __init__(self, concurrency=4, rate=None, retries=3, backoff=0.5,
+                 timeout=30, journal=None, revalidate=False):
+        self.concurrency = concurrency
+        self.rate = rate
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.journal = journal
+        self.revalidate = revalidate
+        self._sessions = {}
+        self._limiters = {}
+        self._executor = None
+
+    def session(self, host):
+        """Return the session of a host, keeping its connections open."""
+        if host not in self._sessions:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_maxsize=self.concurrency)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self._sessions[host] = session
+        return self._sessions[host]
+
+    def limiter(self, host):
+        """Return the concurrency and rate limiter of a host."""
+        if host not in self._limiters:
+            self._limiters[host] = HostLimiter(self.concurrency, self.rate)
+        return self._limiters[host]
+
+    async def fetch(self, url, params=None, headers=None):
+        """Return the response to a page request, or None if it fails."""
+        host = urlsplit(url).netloc
+        limiter = self.limiter(host)
+        get = partial(self.session(host).get, url, params=params,
+                      headers=headers, timeout=self.timeout)
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.retries + 1):
+            if attempt > 0:
+                await asyncio.sleep(self.backoff * 2**(attempt-1))
+            async with limiter.semaphore:
+                await limiter.wait()
+                try:
+                    r = await loop.run_in_executor(self._executor, get)
+                except requests.RequestException:
+                    continue
+            if r.status_code not in self.RETRY_STATUS:
+                break
+        else:
+            return None
+        return r
+
+    @staticmethod
+    def thread_key(job):
+        """Return the key of the thread of a job in the journal."""
+        return '{}/{}'.format(job.site.name, job.thread_id)
+
+    async def fetch_posts(self, job, page):
+        """Return the post texts in a page of a thread and its record.
+
+        The record is a (url, page, etag, last_modified, hash) tuple to be
+        committed to the journal, or None if the page was not fetched or is
+        unchanged, in which case no post is returned.
+        """
+        url, params = job.site.page_url(job.thread_id, page)
+        key = requests.Request('GET', url, params=params).prepare().url
+        headers = {}
+        known = None if self.journal is None else self.journal.page(key)
+        if known is not None:
+            last_page = self.journal.last_page(self.thread_key(job))
+            if not self.revalidate and page < last_page:
+                return [], None
+            etag, last_modified, _ = known
+            if etag is not None:
+                headers['If-None-Match'] = etag
+            if last_modified is not None:
+                headers['If-Modified-Since'] = last_modified
+        r = await self.fetch(url, params, headers)
+        if r is None or r.status_code != 200:
+            return [], None
+        content_hash = CrawlJournal.hash(r.text)
+        if known is not None and content_hash == known[2]:
+            return [], None
+        record = (key, page, r.headers.get('ETag'),
+                  r.headers.get('Last-Modified'), content_hash)
+        return job.site.parse(r.text), record
+
+    async def crawl_thread(self, job, callback=None):
+        """Return the posts of all pages of a thread, in order.
+
+        callback(job, posts) is called before the posts and pages are
+        committed to the journal, so posts saved by the callback are not
+        lost if the crawl is interrupted.
+        """
+        pages = await asyncio.gather(*[self.fetch_posts(job, page)
+                                       for page in job.pages])
+        texts = [text for posts, _ in pages for text in posts]
+        if self.journal is None:
+            posts = [Post(*post) for post in enumerate(texts)]
+        else:
+            posts = [Post(*post) for post in
+                     self.journal.number_posts(self.thread_key(job), texts)]
+        if callback is not None:
+            callback(job, posts)
+        if self.journal is not None:
+            records = [record for _, record in pages if record is not None]
+            self.journal.commit(self.thread_key(job), posts, records)
+        return posts
+
+    async def crawl_all(self, jobs, callback=None):
+        """Crawl all jobs, calling callback(job, posts) as each finishes."""
+        return await asyncio.gather(*[self.crawl_thread(job, callback)
+                                      for job in jobs])
+
+    def run(self, jobs, callback=None):
+        """Crawl all jobs and return the posts of each thread."""
+        max_workers = self.concurrency * max(1, len(set(
+            urlsplit(job.site.page_url(job.thread_id, 1)[0]).netloc
+            for job in jobs)))
+        with ThreadPoolExecutor(max_workers) as executor:
+            self._executor = executor
+            loop = asyncio.new_event_loop()
+            try:
+                # Limiters must be created within the loop
+                self._limiters = {}
+                return loop.run_until_complete(self.crawl_all(jobs,
+                                                              callback))
+            finally:
+                loop.close()
+                self._executor = None
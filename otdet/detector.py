@@ -2,51 +2,265 @@
 Out-of-topic post detection methods.
 """
 
+from collections import Counter
+import copy
+
 import numpy as np
-import scipy.spatial.distance as dist
-from sklearn.cross_validation import LeaveOneOut
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import CountVectorizer
 
+from otdet import distance
 from otdet.feature_extraction import CountVectorizerWrapper
 
 
 class OOTDetector:
-    """Off-topic detection methods."""
+    """Off-topic detection methods.
+
+    With `sparse=True` the default extractor returns sparse count matrices
+    and all distances are computed without densifying them. `max_memory`
+    bounds the bytes taken by each block of pairwise distances in ClustDist
+    and `n_jobs` is the number of processes computing those blocks. If a
+    FeatureCache is given as `cache`, the extractor looks up the features
+    of previously seen documents there.
+    """
 
-    def __init__(self, extractor=None):
+    def __init__(self, extractor=None, sparse=False, max_memory=None,
+                 n_jobs=1, cache=None):
         if extractor is None:
             self.extractor = CountVectorizerWrapper(input='content',
-                                                    stop_words='english')
+                                                    stop_words='english',
+                                                    sparse=sparse)
         else:
             self.extractor = extractor
+        self.max_memory = max_memory
+        self.n_jobs = n_jobs
+        self.cache = cache
 
-    def design_matrix(self, documents):
+    METHODS = ['clust_dist', 'mean_comp', 'txt_comp_dist']
+
+    def design_matrix(self, documents, extractor=None):
         """Returns feature vector of each document as matrix."""
-        return self.extractor.fit_transform(documents)
+        if extractor is None:
+            extractor = self.extractor
+        if self.cache is None:
+            return extractor.fit_transform(documents)
+        return extractor.fit_transform(documents, cache=self.cache)
 
     def clust_dist(self, documents, metric='euclidean'):
         """Compute ClustDist score of each document."""
         X = self.design_matrix(documents)
-        return np.mean(dist.squareform(dist.pdist(X, metric)), axis=0)
+        return distance.mean_pairwise(X, metric, max_memory=self.max_memory,
+                                      n_jobs=self.n_jobs)
 
     def mean_comp(self, documents, metric='euclidean'):
-        """Compute MeanComp score of each document."""
+        """Compute MeanComp score of each document.
+
+        The mean of the other documents is obtained by subtracting the
+        document from the column sum, so no loop over documents is needed.
+        """
         X = self.design_matrix(documents)
-        m = X.shape[0]
-        res = []
-        for i, (comp, vec) in enumerate(LeaveOneOut(m)):
-            v, u = np.mean(X[comp], axis=0), np.ravel(X[vec])
-            distfunc = getattr(dist, metric)
-            res.append(distfunc(u, v))
-        return np.array(res)
+        return distance.complement(X, metric, mean=True)
 
     def txt_comp_dist(self, documents, metric='euclidean'):
-        """Compute TxtCompDist score of each document."""
+        """Compute TxtCompDist score of each document.
+
+        If the extractor is additive, the features of the complement text
+        are the total features minus those of the document, so each
+        document is featurized only once. Otherwise the complement text of
+        every document is featurized separately.
+        """
+        if getattr(self.extractor, 'is_additive', False):
+            X = self.design_matrix(documents)
+            return distance.complement(X, metric, mean=False)
+
         self.extractor.fit(documents)
         res = []
         for i, cont in enumerate(documents):
             comp = ' '.join(documents[:i] + documents[i+1:])
             u = self.extractor.transform([cont])
             v = self.extractor.transform([comp])
-            distfunc = getattr(dist, metric)
-            res.append(distfunc(u, v))
+            res.append(distance.between(u, v, metric))
         return np.array(res)
+
+    def score_threads(self, threads, method='clust_dist', metric='euclidean',
+                      offsets=None):
+        """Compute scores of each document of many threads at once.
+
+        `threads` is a list of threads, each a list of documents, and a list
+        of score arrays is returned. Alternatively, `threads` may be a flat
+        list of documents with thread t consisting of documents offsets[t]
+        to offsets[t+1]-1, in which case a flat array of scores is returned.
+        `method` is the name of the scoring method.
+
+        If the extractor is separable, all documents are featurized in a
+        single pass and the scores of all threads are computed together on
+        the block diagonal of the sparse count matrix. Otherwise each
+        thread is scored on its own. Either way, a ValueError is raised if
+        a thread has documents but no features, e.g. only stop words.
+        """
+        if method not in self.METHODS:
+            raise Exception("Unsupported method: '{}'".format(method))
+        flat = offsets is not None
+        if not flat:
+            documents = [doc for thread in threads for doc in thread]
+            sizes = [len(thread) for thread in threads]
+            offsets = np.concatenate(([0], np.cumsum(sizes, dtype=int)))
+        else:
+            documents, offsets = threads, np.asarray(offsets)
+        batched = getattr(self.extractor, 'is_separable', False) and (
+            method != 'txt_comp_dist' or
+            getattr(self.extractor, 'is_additive', False))
+
+        if len(documents) == 0:
+            scores = np.array([])
+        elif not batched:
+            scores = [getattr(self, method)(list(documents[a:b]), metric)
+                      for a, b in zip(offsets[:-1], offsets[1:])]
+            scores = np.concatenate(scores)
+        else:
+            extractor = copy.copy(self.extractor)
+            extractor.sparse = True
+            X = sp.csr_matrix(self.design_matrix(documents,
+                                                 extractor=extractor))
+            # Fitted alone, such a thread would have an empty vocabulary
+            empty = (np.diff(X.indptr[offsets]) == 0) & (np.diff(offsets) > 0)
+            if np.any(empty):
+                raise ValueError('Thread {} has no features, e.g. only stop '
+                                 'words'.format(np.flatnonzero(empty)[0]))
+            # Each thread has its own vocabulary when fitted alone
+            dims = 'nonzero' if metric == 'correlation' else None
+            if method == 'clust_dist':
+                scores = distance.segmented_mean_pairwise(
+                    X, offsets, metric, dims=dims,
+                    max_memory=self.max_memory, n_jobs=self.n_jobs)
+            else:
+                scores = distance.segmented_complement(
+                    X, offsets, metric, dims=dims,
+                    mean=(method == 'mean_comp'))
+        if flat:
+            return scores
+        return [scores[a:b] for a, b in zip(offsets[:-1], offsets[1:])]
+
+
+class IncrementalOOTDetector:
+    """Off-topic detection on a thread whose posts arrive one at a time.
+
+    Posts are featurized by unigram counts over a vocabulary growing with
+    the thread, giving the same scores as OOTDetector with its default
+    extractor on all posts so far. Instead of recomputing everything, the
+    column sums, row norms and sums, dot products with the column sums and
+    the sums of pairwise distances are updated as each post is added, in
+    O(n*d) at most. For correlation distance, which changes whenever the
+    vocabulary grows, the n x n Gram matrix is kept instead.
+    """
+
+    def __init__(self, metric='euclidean', analyzer=None):
+        if metric not in distance.METRICS:
+            raise Exception("Unsupported metric: '{}'".format(metric))
+        if analyzer is None:
+            analyzer = CountVectorizer(input='content',
+                                       stop_words='english').build_analyzer()
+        self.metric = metric
+        self.analyzer = analyzer
+        self.vocabulary = {}
+        self.X = sp.csr_matrix((0, 0))
+        self.col_sums = np.zeros(0)
+        self.sq_norms = np.zeros(0)
+        self.sums = np.zeros(0)
+        self.dots = np.zeros(0)             # Dot products with col_sums
+        self.dist_sums = np.zeros(0)        # Row sums of distance matrix
+        self.gram = np.zeros((0, 0))        # Only for correlation
+
+    def __len__(self):
+        return self.X.shape[0]
+
+    def _vectorize(self, document):
+        """Return the counts of a document, growing the vocabulary."""
+        counts = Counter(self.analyzer(document))
+        for token in counts:
+            if token not in self.vocabulary:
+                self.vocabulary[token] = len(self.vocabulary)
+        cols = np.array([self.vocabulary[t] for t in counts], dtype=int)
+        vals = np.array(list(counts.values()), dtype=float)
+        return cols, vals
+
+    def add(self, document):
+        """Add a post to the thread and return its index."""
+        n, d_old = self.X.shape
+        cols, vals = self._vectorize(document)
+        d = len(self.vocabulary)
+
+        # Dot products and L1 overlaps with previous posts, which are zero
+        # in the new columns
+        old = cols < d_old
+        x_old = np.zeros(d_old)
+        x_old[cols[old]] = vals[old]
+        dots = self.X.dot(x_old)
+        xx, xsum = np.dot(vals, vals), np.sum(vals)
+
+        # Update running statistics
+        S = np.concatenate((self.col_sums, np.zeros(d - d_old)))
+        xS = np.dot(S[cols], vals)
+        S[cols] += vals
+        self.col_sums = S
+        self.dots = np.append(self.dots + dots, xS + xx)
+        self.sq_norms = np.append(self.sq_norms, xx)
+        self.sums = np.append(self.sums, xsum)
+        if self.metric == 'correlation':
+            G = np.zeros((n+1, n+1))
+            G[:n, :n], G[n, :n], G[:n, n], G[n, n] = self.gram, dots, dots, xx
+            self.gram = G
+        else:
+            if self.metric == 'cityblock':
+                # Counts are nonnegative, so |a-b| = a + b - 2*min(a, b)
+                sub = self.X[:, cols[old]].tocoo()
+                mins = np.minimum(sub.data, vals[old][sub.col])
+                overlap = np.bincount(sub.row, weights=mins, minlength=n)
+                dists = self.sums[:n] + xsum - 2*overlap
+            else:
+                dists = distance.from_gram(dots[np.newaxis, :],
+                                           np.array([xx]),
+                                           self.sq_norms[:n], None, None,
+                                           d, self.metric)[0]
+            self.dist_sums = np.append(self.dist_sums + dists, np.sum(dists))
+
+        row = sp.csr_matrix((vals, cols, [0, len(cols)]), shape=(1, d))
+        X = sp.csr_matrix((self.X.data, self.X.indices, self.X.indptr),
+                          shape=(n, d))
+        self.X = sp.vstack([X, row], format='csr')
+        return n
+
+    def extend(self, documents):
+        """Add several posts to the thread."""
+        for document in documents:
+            self.add(document)
+
+    def clust_dist(self):
+        """Return ClustDist score of each post so far."""
+        n, d = self.X.shape
+        if self.metric != 'correlation':
+            return self.dist_sums / n
+        D = distance.from_gram(self.gram, self.sq_norms, self.sq_norms,
+                               self.sums, self.sums, d, self.metric)
+        np.fill_diagonal(D, 0)
+        return np.mean(D, axis=1)
+
+    def _complement(self, mean):
+        """Return distance of each post to the sum or mean of the others."""
+        n, d = self.X.shape
+        if self.metric == 'cityblock':
+            return distance.complement(self.X, self.metric, mean=mean)
+        with np.errstate(divide='ignore'):
+            scale = np.float64(1)/(n-1) if mean else np.float64(1)
+        S = self.col_sums
+        return distance.complement_from_moments(
+            self.sq_norms, self.dots, self.sums, np.dot(S, S), np.sum(S), d,
+            scale, self.metric)
+
+    def mean_comp(self):
+        """Return MeanComp score of each post so far."""
+        return self._complement(mean=True)
+
+    def txt_comp_dist(self):
+        """Return TxtCompDist score of each post so far."""
+        return self._complement(mean=False)
@@ -0,0 +1,425 @@
+"""
+Distance metrics supporting both dense arrays and sparse matrices.
+"""
+
+from multiprocessing import Pool
+
+import numpy as np
+import scipy.sparse as sp
+import scipy.spatial.distance as dist
+from sklearn.metrics.pairwise import manhattan_distances
+
+
+METRICS = ['euclidean', 'cityblock', 'cosine', 'correlation']
+MAX_MEMORY = 2**27      # Default bytes taken by a block of distances
+
+# Arguments shared by the worker processes of mean_pairwise
+_shared = {}
+
+# Number of distance-sized arrays alive at once when a block of distances
+# is computed from sparse products: the Gram matrix, temporaries and result
+_GRAM_ARRAYS = {'euclidean': 4, 'cosine': 3, 'correlation': 3}
+
+
+def _row_sums(X):
+    """Return the sum of each row of X as a flat array."""
+    return np.asarray(X.sum(axis=1), dtype=float).ravel()
+
+
+def _row_sq_norms(X):
+    """Return the squared euclidean norm of each row of X as a flat array."""
+    if sp.issparse(X):
+        return _row_sums(X.multiply(X))
+    X = np.asarray(X, dtype=float)
+    return np.einsum('ij,ij->i', X, X)
+
+
+def _dot(XA, XB):
+    """Return the dense matrix of dot products between rows of XA and XB."""
+    if sp.issparse(XA):
+        res = XA.dot(XB.T)
+    elif sp.issparse(XB):
+        res = XB.dot(np.asarray(XA, dtype=float).T).T
+    else:
+        res = np.dot(XA, XB.T)
+    if sp.issparse(res):
+        res = res.toarray()
+    return np.asarray(res, dtype=float)
+
+
+def _sparse_cdist(XA, XB, metric):
+    """Compute cdist with at least one sparse operand without densifying."""
+    if metric == 'cityblock':
+        return manhattan_distances(XA, XB)
+    if metric not in METRICS:
+        raise Exception("Unsupported metric for sparse input: '{}'"
+                        .format(metric))
+
+    return from_gram(_dot(XA, XB), _row_sq_norms(XA), _row_sq_norms(XB),
+                     _row_sums(XA), _row_sums(XB), XA.shape[1], metric)
+
+
+def from_gram(G, na, nb, sa, sb, d, metric='euclidean'):
+    """Compute distances between two sets of vectors from their Gram matrix.
+
+    G holds the dot products between the vectors, na and nb their squared
+    norms, sa and sb their sums and d is their dimension. Cityblock
+    distance cannot be computed this way.
+    """
+    if metric == 'euclidean':
+        sq = na[:, np.newaxis] + nb[np.newaxis, :] - 2*G
+        return np.sqrt(np.maximum(sq, 0))
+    if metric == 'correlation':
+        # Center the vectors implicitly: (u-u')(v-v') = uv - d*u'*v'
+        G = G - np.outer(sa, sb)/d
+        na, nb = na - sa**2/d, nb - sb**2/d
+    elif metric != 'cosine':
+        raise Exception("Unsupported metric: '{}'".format(metric))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return 1 - G/np.sqrt(np.outer(na, nb))
+
+
+def cdist(XA, XB, metric='euclidean'):
+    """Compute distance between each pair of rows of XA and XB.
+
+    If either XA or XB is a sparse matrix, the distances are computed from
+    sparse products so that neither of them is ever densified.
+    """
+    if sp.issparse(XA) or sp.issparse(XB):
+        return _sparse_cdist(XA, XB, metric)
+    return dist.cdist(XA, XB, metric)
+
+
+def pairwise(X, metric='euclidean'):
+    """Compute the square matrix of distances between rows of X."""
+    if sp.issparse(X):
+        res = _sparse_cdist(X, X, metric)
+        np.fill_diagonal(res, 0)
+        return res
+    return dist.squareform(dist.pdist(X, metric))
+
+
+def _block_means(X, start, stop, metric):
+    """Return the mean distance of rows start..stop-1 of X to all rows."""
+    D = cdist(X[start:stop], X, metric)
+    D[np.arange(stop-start), np.arange(start, stop)] = 0
+    return np.mean(D, axis=1)
+
+
+def _init_worker(X, metric):
+    _shared['X'], _shared['metric'] = X, metric
+
+
+def _worker_block_means(bounds):
+    return _block_means(_shared['X'], bounds[0], bounds[1],
+                        _shared['metric'])
+
+
+def mean_pairwise(X, metric='euclidean', max_memory=None, n_jobs=1):
+    """Compute the mean distance of each row of X to all rows of X.
+
+    This equals the row means of pairwise(X, metric), but the distance
+    matrix is computed in blocks of rows, so the full square matrix is
+    never allocated. A block and the temporaries of the same size needed
+    to compute it take at most `max_memory` bytes (dense correlation also
+    copies X to center it). With n_jobs > 1 the blocks are distributed
+    over that many worker processes, each taking that much memory.
+    """
+    if max_memory is None:
+        max_memory = MAX_MEMORY
+    n = X.shape[0]
+    arrays = 1
+    if sp.issparse(X):
+        X = X.tocsr()
+        arrays = _GRAM_ARRAYS.get(metric, 1)
+    else:
+        X = np.asarray(X)
+    size = max(1, max_memory // (8*max(n, 1)*arrays))
+    bounds = [(i, min(i+size, n)) for i in range(0, n, size)]
+    if n_jobs > 1 and len(bounds) > 1:
+        with Pool(n_jobs, _init_worker, (X, metric)) as pool:
+            means = pool.map(_worker_block_means, bounds)
+    else:
+        means = [_block_means(X, start, stop, metric)
+                 for start, stop in bounds]
+    return np.concatenate(means) if means else np.array([])
+
+
+def paired(XA, XB, metric='euclidean'):
+    """Compute distance between each row of XA and the same row of XB."""
+    XA, XB = np.asarray(XA, dtype=float), np.asarray(XB, dtype=float)
+    if metric == 'euclidean':
+        return np.sqrt(np.sum((XA-XB)**2, axis=1))
+    if metric == 'cityblock':
+        return np.sum(np.abs(XA-XB), axis=1)
+    if metric == 'correlation':
+        XA = XA - np.mean(XA, axis=1)[:, np.newaxis]
+        XB = XB - np.mean(XB, axis=1)[:, np.newaxis]
+    elif metric != 'cosine':
+        raise Exception("Unsupported metric: '{}'".format(metric))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return 1 - np.sum(XA*XB, axis=1)/np.sqrt(_row_sq_norms(XA) *
+                                                 _row_sq_norms(XB))
+
+
+def _from_moments(xx, xc, cc, xsum, csum, d, metric):
+    """Compute paired distances from dot products and sums of the vectors.
+
+    xx and cc are the squared norms of the first and second vectors, xc
+    their dot products and xsum and csum their sums. d is the dimension.
+    """
+    if metric == 'euclidean':
+        return np.sqrt(np.maximum(xx - 2*xc + cc, 0))
+    if metric == 'correlation':
+        xc = xc - xsum*csum/d
+        xx, cc = xx - xsum**2/d, cc - csum**2/d
+    elif metric != 'cosine':
+        raise Exception("Unsupported metric: '{}'".format(metric))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return 1 - xc/np.sqrt(xx*cc)
+
+
+def complement(X, metric='euclidean', mean=True):
+    """Compute distance between each row of X and its complement.
+
+    The complement of a row is the sum of all other rows, or their mean if
+    `mean` is true. All complements are derived from the single column sum
+    of X, so the cost is linear in the size of X. Sparse X is never
+    densified.
+    """
+    n = X.shape[0]
+    S = np.asarray(X.sum(axis=0), dtype=float).ravel()
+    with np.errstate(divide='ignore'):
+        scale = np.float64(1)/(n-1) if mean else np.float64(1)
+    if not sp.issparse(X):
+        X = np.asarray(X, dtype=float)
+        with np.errstate(invalid='ignore'):
+            return paired(X, (S - X)*scale, metric)
+
+    X = X.tocsr()
+    if metric == 'cityblock':
+        # Only the nonzero columns of a row differ from the complement of
+        # an all-zero row, whose distance is simply the L1 norm of S.
+        rows = np.repeat(np.arange(n), np.diff(X.indptr))
+        x, s = X.data, S[X.indices]
+        with np.errstate(invalid='ignore'):
+            delta = np.abs(x - (s-x)*scale) - np.abs(s)*scale
+            return np.sum(np.abs(S))*scale + np.bincount(rows, weights=delta,
+                                                         minlength=n)
+    return complement_from_moments(_row_sq_norms(X), X.dot(S), _row_sums(X),
+                                   np.dot(S, S), np.sum(S), X.shape[1],
+                                   scale, metric)
+
+
+def complement_from_moments(xx, xS, xsum, SS, Ssum, d, scale,
+                            metric='euclidean'):
+    """Compute complement distances from running statistics of the rows.
+
+    xx, xS and xsum are the squared norms of the rows, their dot products
+    with the column sum S and their sums. SS and Ssum are the squared norm
+    and the sum of S, d is the number of columns and the complement of a
+    row x is (S - x)*scale. Cityblock distance cannot be computed this way.
+    """
+    with np.errstate(invalid='ignore'):
+        xc = (xS - xx)*scale
+        cc = (SS - 2*xS + xx)*scale**2
+        csum = (Ssum - xsum)*scale
+        return _from_moments(xx, xc, cc, xsum, csum, d, metric)
+
+
+def between(u, v, metric='euclidean'):
+    """Compute distance between two vectors, either of them may be sparse."""
+    if sp.issparse(u) or sp.issparse(v):
+        return _sparse_cdist(u, v, metric)[0, 0]
+    return getattr(dist, metric)(np.ravel(u), np.ravel(v))
+
+
+def _segment_ids(offsets):
+    """Return the segment of each row, given the offsets of the segments."""
+    return np.repeat(np.arange(len(offsets)-1), np.diff(offsets))
+
+
+def _pairs_within(groups, starts, sizes):
+    """Return all ordered pairs of items in the same group.
+
+    Item i belongs to group groups[i], and group g consists of the items
+    starts[g] to starts[g]+sizes[g]-1. Returns the first and second items
+    of the pairs, ordered by first item.
+    """
+    counts = sizes[groups]
+    first = np.repeat(np.arange(len(groups)), counts)
+    pos = np.arange(len(first)) - np.repeat(np.cumsum(counts)-counts, counts)
+    return first, np.repeat(starts[groups], counts) + pos
+
+
+def block_diagonal(X, offsets):
+    """Give each segment of rows of X its own copy of the columns.
+
+    Segment t consists of rows offsets[t] to offsets[t+1]-1. Only columns
+    with nonzero entries in a segment are kept for it, so in the resulting
+    CSR matrix rows of different segments never share a column and the
+    product of the matrix with its transpose is block diagonal. Columns
+    are ordered by segment. Returns the matrix and the segment of each of
+    its columns.
+    """
+    X = sp.csr_matrix(X)
+    n, d = X.shape
+    seg = _segment_ids(offsets)
+    entry_seg = seg[np.repeat(np.arange(n), np.diff(X.indptr))]
+    keys = entry_seg.astype(np.int64)*d + X.indices
+    uniq, cols = np.unique(keys, return_inverse=True)
+    Xb = sp.csr_matrix((X.data, cols, X.indptr), shape=(n, len(uniq)))
+    return Xb, uniq // max(d, 1)
+
+
+def _segment_dims(dims, X, col_seg, num_segments):
+    """Return the dimension of each segment for correlation distance."""
+    if dims is None:
+        return np.repeat(X.shape[1], num_segments)
+    if isinstance(dims, str) and dims == 'nonzero':
+        return np.bincount(col_seg, minlength=num_segments)
+    return np.asarray(dims)
+
+
+def _segment_bounds(offsets, max_memory):
+    """Split segments into chunks with about max_memory bytes of pairs.
+
+    A segment with more pairs than that makes a chunk of its own.
+    """
+    pairs = np.diff(offsets)**2
+    budget = max(1, max_memory // 8)
+    large = pairs > budget
+    chunk = np.cumsum(pairs) // budget
+    bounds = np.flatnonzero((np.diff(chunk) != 0) | large[1:] |
+                            large[:-1]) + 1
+    bounds = np.concatenate(([0], bounds, [len(pairs)]))
+    return [(a, b) for a, b in zip(bounds[:-1], bounds[1:]) if a < b]
+
+
+def _segment_means(Xb, offsets, col_seg, dims, metric, start, stop):
+    """Return the mean distances of rows of segments start..stop-1."""
+    r0, r1 = offsets[start], offsets[stop]
+    c0, c1 = np.searchsorted(col_seg, [start, stop])
+    X = Xb[r0:r1, c0:c1]
+    starts, sizes = offsets[start:stop] - r0, np.diff(offsets[start:stop+1])
+    seg = _segment_ids(offsets[start:stop+1])
+    m = r1 - r0
+
+    if metric == 'cityblock':
+        # |x-y| summed over y is the sum of L1 norms minus, for each column
+        # shared by x and y, |x_c| + |y_c| - |x_c - y_c|
+        X = X.tocsc()
+        l1 = _row_sums(abs(X))
+        col = np.repeat(np.arange(X.shape[1]), np.diff(X.indptr))
+        a, b = _pairs_within(col, X.indptr[:-1], np.diff(X.indptr))
+        u, v = X.data[a], X.data[b]
+        shared = np.bincount(X.indices[a], minlength=m,
+                             weights=np.abs(u) + np.abs(v) - np.abs(u-v))
+        totals = np.bincount(seg, weights=l1, minlength=stop-start)
+        sums = sizes[seg]*l1 + totals[seg] - shared
+    elif metric in METRICS:
+        i, j = _pairs_within(seg, starts, sizes)
+        counts = sizes[seg]
+        G = X.dot(X.T).tocoo()
+        g = np.zeros(len(i))
+        g[np.cumsum(counts)[G.row] - counts[G.row] + G.col -
+          starts[seg[G.row]]] = G.data
+        norms, rsums = _row_sq_norms(X), _row_sums(X)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            D = _from_moments(norms[i], g, norms[j], rsums[i], rsums[j],
+                              dims[start:stop][seg[i]], metric)
+        D[i == j] = 0
+        sums = np.bincount(i, weights=D, minlength=m)
+    else:
+        raise Exception("Unsupported metric: '{}'".format(metric))
+    with np.errstate(invalid='ignore'):
+        return sums / sizes[seg]
+
+
+def _large_segment_means(Xb, offsets, col_seg, dim, metric, t,
+                         max_memory, n_jobs):
+    """Return the mean distances of rows of segment t, in blocks of rows."""
+    r0, r1 = offsets[t], offsets[t+1]
+    c0, c1 = np.searchsorted(col_seg, [t, t+1])
+    X = Xb[r0:r1, c0:c1]
+    # Zero columns change no distance, only the dimension for correlation
+    X = sp.csr_matrix((X.data, X.indices, X.indptr), shape=(r1-r0, dim))
+    return mean_pairwise(X, metric, max_memory=max_memory, n_jobs=n_jobs)
+
+
+def _init_segment_worker(Xb, offsets, col_seg, dims, metric):
+    _shared['args'] = (Xb, offsets, col_seg, dims, metric)
+
+
+def _worker_segment_means(bounds):
+    return _segment_means(*(_shared['args'] + bounds))
+
+
+def segmented_mean_pairwise(X, offsets, metric='euclidean', dims=None,
+                            max_memory=None, n_jobs=1):
+    """Compute mean_pairwise separately within each segment of rows of X.
+
+    Segment t consists of rows offsets[t] to offsets[t+1]-1 and dims[t] is
+    its dimension for correlation distance (X.shape[1] if dims is None).
+    With dims='nonzero', the dimension of a segment is its number of
+    nonzero columns, as if it were featurized alone.
+
+    All segments are processed together, in chunks of segments whose
+    distances take about `max_memory` bytes (the arrays indexing the pairs
+    take a few times more). A segment too large for that is processed on
+    its own by mean_pairwise, in blocks of rows. With n_jobs > 1 the
+    chunks are distributed over that many worker processes.
+    """
+    if max_memory is None:
+        max_memory = MAX_MEMORY
+    offsets = np.asarray(offsets)
+    Xb, col_seg = block_diagonal(X, offsets)
+    dims = _segment_dims(dims, X, col_seg, len(offsets)-1)
+    args = (Xb, offsets, col_seg, dims, metric)
+    bounds = _segment_bounds(offsets, max_memory)
+    sizes = np.diff(offsets)
+    large = [(a, b) for a, b in bounds
+             if sizes[a]**2 > max(1, max_memory // 8)]
+    chunks = [bound for bound in bounds if bound not in large]
+    if n_jobs > 1 and len(chunks) > 1:
+        with Pool(n_jobs, _init_segment_worker, args) as pool:
+            means = pool.map(_worker_segment_means, chunks)
+    else:
+        means = [_segment_means(*(args + b)) for b in chunks]
+    means = dict(zip(chunks, means))
+    for a, b in large:
+        means[a, b] = _large_segment_means(Xb, offsets, col_seg, dims[a],
+                                           metric, a, max_memory, n_jobs)
+    means = [means[bound] for bound in bounds]
+    return np.concatenate(means) if means else np.array([])
+
+
+def segmented_complement(X, offsets, metric='euclidean', dims=None,
+                         mean=True):
+    """Compute complement separately within each segment of rows of X.
+
+    Segments and dims are as in segmented_mean_pairwise. The complement of
+    a row is the sum or mean of the other rows of its segment.
+    """
+    offsets = np.asarray(offsets)
+    Xb, col_seg = block_diagonal(X, offsets)
+    n, T = Xb.shape[0], len(offsets)-1
+    dims = _segment_dims(dims, X, col_seg, T)
+    seg = _segment_ids(offsets)
+    S = _row_sums(Xb.T)
+    with np.errstate(divide='ignore'):
+        scale = 1/(np.diff(offsets)[seg] - 1.) if mean else np.ones(n)
+
+    if metric == 'cityblock':
+        rows = np.repeat(np.arange(n), np.diff(Xb.indptr))
+        x, s, c = Xb.data, S[Xb.indices], scale[rows]
+        l1 = np.bincount(col_seg, weights=np.abs(S), minlength=T)[seg]
+        with np.errstate(invalid='ignore'):
+            delta = np.abs(x - (s-x)*c) - np.abs(s)*c
+            return l1*scale + np.bincount(rows, weights=delta, minlength=n)
+    SS = np.bincount(col_seg, weights=S**2, minlength=T)[seg]
+    Ssum = np.bincount(col_seg, weights=S, minlength=T)[seg]
+    with np.errstate(divide='ignore'):
+        return complement_from_moments(_row_sq_norms(Xb), Xb.dot(S),
+                                       _row_sums(Xb), SS, Ssum,
+                                       dims[seg], scale, metric)
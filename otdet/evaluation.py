@@ -2,7 +2,7 @@
 Out-of-topic post detection evaluation methods.
 """
 
-from collections import Counter
+from functools import lru_cache
 
 import numpy as np
 from scipy.stats import hypergeom
@@ -10,8 +10,75 @@ from scipy.stats import hypergeom
 from otdet.util import lazyproperty
 
 
+TIES = ['worst', 'best', 'random']
+
+
+def rank_posts(scores, is_oot=None, ties='worst', random_state=None):
+    """Return the indices of posts from the most to the least off-topic.
+
+    scores is an array of shape (posts,) or (experiments, posts), ranked
+    along the last axis by descending score, undefined scores last. Ties
+    are broken according to `ties`: 'worst' ranks normal posts first,
+    'best' ranks OOT posts first (is_oot should then be given) and
+    'random' ranks them in random order, using random_state (a seed or a
+    RandomState). Otherwise tied posts keep their order.
+    """
+    scores = np.asarray(scores, dtype=float)
+    keys = -np.where(np.isnan(scores), -np.inf, scores)
+    if ties not in TIES:
+        raise Exception("Unsupported tie breaking: '{}'".format(ties))
+    if ties == 'random':
+        if not isinstance(random_state, np.random.RandomState):
+            random_state = np.random.RandomState(random_state)
+        tie_keys = random_state.rand(*scores.shape)
+    elif is_oot is None:
+        tie_keys = np.zeros(scores.shape, dtype=bool)
+    else:
+        is_oot = np.asarray(is_oot, dtype=bool)
+        tie_keys = is_oot if ties == 'worst' else ~is_oot
+    return np.lexsort((tie_keys, keys), axis=-1)
+
+
+def ranked_labels(result):
+    """Return whether each ranked post of each experiment is OOT.
+
+    The result is either a list of ranked lists of (distance, is_oot) pairs,
+    one per experiment, or already a boolean array of shape (experiments,
+    ranks).
+    """
+    if isinstance(result, np.ndarray):
+        if result.ndim != 2:
+            raise Exception('Result array should be two-dimensional')
+        return result.astype(bool)
+    lengths = set(len(subresult) for subresult in result)
+    if len(lengths) > 1:
+        raise Exception('Number of posts or OOT posts mismatch')
+    labels = [[is_oot for _, is_oot in subresult] for subresult in result]
+    shape = (len(labels), lengths.pop() if lengths else 0)
+    return np.array(labels, dtype=bool).reshape(shape)
+
+
+@lru_cache(maxsize=None)
+def baseline_table(M, n):
+    """Return the baseline performance vectors for every size of top list.
+
+    The element (N, k) is the probability of getting k OOT posts in the top
+    N list by chance, for N from 0 to M and k from 0 to n. The table is
+    computed in one pass and cached, so it is shared by all evaluators with
+    the same M and n. The result should not be modified.
+    """
+    N = np.arange(M+1)[:, np.newaxis]
+    k = np.arange(n+1)[np.newaxis, :]
+    return hypergeom.pmf(k, M, n, N)
+
+
 class TopListEvaluator:
-    """Evaluate performance of OOT detector based on ranked result list."""
+    """Evaluate performance of OOT detector based on ranked result list.
+
+    The result is either a list of ranked lists of (distance, is_oot) pairs,
+    one per experiment, or a boolean array of shape (experiments, ranks)
+    telling whether the post at each rank is OOT.
+    """
 
     def __init__(self, result, M=None, n=None, N=1):
         if N < 0:
@@ -30,20 +97,30 @@ class TopListEvaluator:
 
     def _get_nums(self):
         """Get the number of all and OOT posts."""
-        def get_num_oot(subresult):
-            return sum(is_oot for _, is_oot in subresult)
+        num_expr, num_post = self.labels.shape
+        if num_expr == 0:
+            return 0, 0
+        num_oot = np.unique(self.top_oot_counts[:, -1])
+        if len(num_oot) > 1:
+            raise Exception('Number of posts or OOT posts mismatch')
+        return num_post, int(num_oot[0])
 
-        temp = [(len(subresult), get_num_oot(subresult))
-                for subresult in self.result]
-        num_post_tup, num_oot_tup = zip(*temp)
-        num_post, num_oot = list(set(num_post_tup)), list(set(num_oot_tup))
+    @lazyproperty
+    def labels(self):
+        """Return whether each ranked post of each experiment is OOT."""
+        return ranked_labels(self.result)
 
-        if len(num_post) > 1 or len(num_oot) > 1:
-            raise Exception('Number of posts or OOT posts mismatch')
-        if len(num_post) == 0 or len(num_oot) == 0:
-            return 0, 0
-        else:
-            return num_post[0], num_oot[0]
+    @lazyproperty
+    def top_oot_counts(self):
+        """Return the number of OOT posts in the top N list for every N.
+
+        The element (i, N) is the count in the i-th experiment, for N from
+        0 to the number of posts.
+        """
+        labels = self.labels
+        res = np.zeros((labels.shape[0], labels.shape[1]+1), dtype=int)
+        np.cumsum(labels, axis=1, out=res[:, 1:])
+        return res
 
     @lazyproperty
     def min_sup(self):
@@ -71,22 +148,116 @@ class TopListEvaluator:
         The k-th element represents the probability of getting k OOT posts in
         the top N list.
         """
-        rv = hypergeom(self.M, self.n, self.N)
-        k = np.arange(self.min_sup, self.max_sup+1)
-        return rv.pmf(k)
+        if self.N > self.M:
+            rv = hypergeom(self.M, self.n, self.N)
+            return rv.pmf(np.arange(self.min_sup, self.max_sup+1))
+        table = baseline_table(self.M, self.n)
+        return table[self.N, self.min_sup:self.max_sup+1].copy()
 
     @lazyproperty
-    def performance(self):
-        """Return the evaluation result in a performance vector."""
-        num_expr = len(self.result)
+    def performance_table(self):
+        """Return the performance vectors for every size of top list.
+
+        The element (N, k) is the fraction of experiments having exactly k
+        OOT posts in the top N list, with both N and k from 0 to the number
+        of posts.
+        """
+        counts = self.top_oot_counts
+        num_expr, num_lists = counts.shape
         if num_expr == 0:
             raise Exception('No experiment error')
-        top_oot_nums = [sum(is_oot for _, is_oot in subresult[:self.N])
-                        for subresult in self.result]
+        width = self.labels.shape[1] + 1
+        index = counts + width*np.arange(num_lists)
+        res = np.bincount(index.ravel(), minlength=num_lists*width)
+        return res.reshape((num_lists, width)) / num_expr
+
+    @lazyproperty
+    def performance(self):
+        """Return the evaluation result in a performance vector.
 
+        Like the baseline, the k-th element is the fraction of experiments
+        with min_sup+k OOT posts in the top N list.
+        """
+        table = self.performance_table
+        res = table[min(self.N, table.shape[0]-1)]
+        res = res[self.min_sup:self.max_sup+1]
         length = self.max_sup - self.min_sup + 1
-        res = np.zeros(length)
-        count = Counter(top_oot_nums)
-        for k in range(length):
-            res[k] = count[k] / num_expr
-        return res
+        return np.concatenate((res, np.zeros(length - len(res))))
+
+
+class RankEvaluator:
+    """Evaluate ranked lists of OOT detector by rank-based metrics.
+
+    The result is given as for TopListEvaluator. All metrics are computed
+    for every experiment at once from the cumulative counts of OOT posts
+    along the ranked lists, so the lists are sorted only once, when they
+    are built (see from_scores). Precision and recall are given at every
+    cutoff, the k-th column being the top k+1 list.
+    """
+
+    def __init__(self, result):
+        self.result = result
+
+    @classmethod
+    def from_scores(cls, scores, is_oot, ties='worst', random_state=None):
+        """Rank posts of each experiment by descending score and evaluate.
+
+        scores and is_oot are arrays of shape (experiments, posts). Ties
+        are broken as in rank_posts.
+        """
+        scores, is_oot = np.atleast_2d(scores), np.atleast_2d(is_oot)
+        order = rank_posts(scores, is_oot, ties, random_state)
+        rows = np.arange(scores.shape[0])[:, np.newaxis]
+        return cls(is_oot[rows, order].astype(bool))
+
+    @lazyproperty
+    def labels(self):
+        """Return whether each ranked post of each experiment is OOT."""
+        return ranked_labels(self.result)
+
+    @lazyproperty
+    def hits(self):
+        """Return the number of OOT posts in the top k list for every k."""
+        return np.cumsum(self.labels, axis=1)
+
+    @lazyproperty
+    def num_oot(self):
+        """Return the number of OOT posts of each experiment."""
+        return np.sum(self.labels, axis=1)
+
+    @lazyproperty
+    def precision(self):
+        """Return the precision of each experiment at every cutoff."""
+        return self.hits / np.arange(1, self.labels.shape[1]+1)
+
+    @lazyproperty
+    def recall(self):
+        """Return the recall of each experiment at every cutoff."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return self.hits / self.num_oot[:, np.newaxis]
+
+    @lazyproperty
+    def average_precision(self):
+        """Return the average precision of each experiment."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.sum(self.precision * self.labels, axis=1) / self.num_oot
+
+    @lazyproperty
+    def reciprocal_rank(self):
+        """Return the reciprocal rank of the first OOT post (0 if none)."""
+        first = np.argmax(self.labels, axis=1)
+        return np.where(self.num_oot > 0, 1 / (first + 1.), 0.)
+
+    @lazyproperty
+    def roc_auc(self):
+        """Return the area under the ROC curve of each experiment.
+
+        This is the fraction of (OOT, normal) pairs of posts in which the
+        OOT post is ranked higher.
+        """
+        num_norm = self.labels.shape[1] - self.num_oot
+        # Normal posts ranked below each post
+        below = num_norm[:, np.newaxis] - np.cumsum(~self.labels, axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.sum(below * self.labels, axis=1) / \
+                (self.num_oot * num_norm)
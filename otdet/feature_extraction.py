@@ -1,26 +1,50 @@
+from collections import Counter
 from functools import lru_cache
-from statistics import mean
+from multiprocessing import Pool
 from string import punctuation
-import warnings
 
-from nltk.corpus import cmudict
 from nltk.tokenize import word_tokenize, sent_tokenize
 import numpy as np
 from sklearn.feature_extraction.text import CountVectorizer
 
+from otdet.syllables import default_table, heuristic_syllables
 from otdet.util import lazyproperty
 
 
+def _document_counts(args):
+    """Tokenize a document and return its readability counts."""
+    content, remove_punct, oov = args
+    return ReadabilityMeasures.counts(TokenizedContent(content, remove_punct),
+                                      oov)
+
+
 class ReadabilityMeasures:
-    """Extract features based on readablility measures."""
+    """Extract features based on readablility measures.
 
-    d = cmudict.dict()
+    Documents are tokenized once and all counts needed by the measures are
+    gathered in a single pass, so the measures are evaluated on all
+    documents at once. With n_jobs > 1 the documents are tokenized by that
+    many worker processes. The syllables of words not in the CMU corpus
+    are the average of words with the same length if `oov` is 'average',
+    or are guessed from their spelling if it is 'heuristic'.
+    """
+
+    table = None        # Syllable table (None for the default table)
     INF = 10**9
+    # Measures which evaluate() computes for many documents at once
+    VECTORIZED = ['fleschease', 'fleschgrade', 'fogindex', 'colemanliau',
+                  'ari', 'lix', 'smog']
+    # Readability of concatenated documents is not a sum of readabilities
+    is_additive = False
 
     def __init__(self, lowercase=True, remove_punct=True, measures=None,
-                 **kwargs):
+                 n_jobs=1, oov='average', **kwargs):
+        if oov not in ['average', 'heuristic']:
+            raise Exception("oov should be either 'average' or 'heuristic'")
         self.lowercase = lowercase
+        self.oov = oov
         self.remove_punct = remove_punct
+        self.n_jobs = n_jobs
         if measures is None:
             self.measures = [
                 'fleschease', 'fleschgrade', 'fogindex', 'colemanliau',
@@ -33,9 +57,20 @@ class ReadabilityMeasures:
         # Do nothing
         pass
 
-    def fit_transform(self, documents):
-        # Directly transform
-        return self.transform(documents)
+    def fit_transform(self, documents, cache=None):
+        # Directly transform, looking up the vectors in cache if given
+        if cache is None:
+            return self.transform(documents)
+        vectors = cache.features(self.cache_namespace, documents,
+                                 lambda docs: list(self.transform(docs)))
+        return np.array(vectors)
+
+    @property
+    def cache_namespace(self):
+        """Return the namespace of this extractor in a feature cache."""
+        return 'readability:{}:{}:{}:{}'.format(self.lowercase,
+                                                 self.remove_punct, self.oov,
+                                                 ','.join(self.measures))
 
     def transform(self, documents):
         """Transform documents into vectors of readability measures."""
@@ -45,15 +80,75 @@ class ReadabilityMeasures:
         else:
             contents = documents
 
-        tokcontents = [TokenizedContent(cont, self.remove_punct)
-                       for cont in contents]
-        return np.array([self._to_vector(tcont) for tcont in tokcontents])
+        if any(m not in self.VECTORIZED for m in self.measures):
+            # Custom measures can only be computed one document at a time
+            tokcontents = [TokenizedContent(cont, self.remove_punct)
+                           for cont in contents]
+            return np.array([self._to_vector(tcont)
+                             for tcont in tokcontents])
+
+        args = [(cont, self.remove_punct, self.oov) for cont in contents]
+        if self.n_jobs > 1:
+            with Pool(self.n_jobs) as pool:
+                counts = pool.map(_document_counts, args,
+                                  chunksize=max(1, len(args)//self.n_jobs))
+        else:
+            counts = [_document_counts(arg) for arg in args]
+        return self.evaluate(np.array(counts).reshape(-1, 6))
 
     def _to_vector(self, tokenized_content):
         """Convert a tokenized content to a feature vector."""
         return np.array([getattr(self, m)(tokenized_content)
                         for m in self.measures])
 
+    @staticmethod
+    def counts(tokenized_content, oov='average'):
+        """Return the counts needed by the measures in a single pass.
+
+        They are the number of words, sentences, chars, syllables, words
+        with at least 3 syllables and words with at least 6 chars.
+        """
+        nwords = nsents = nchars = nsylls = nwords3sylls = nwords6chars = 0
+        for s in tokenized_content:
+            nsents += 1
+            for w in s:
+                k = ReadabilityMeasures.num_syllables(w, oov)
+                nwords += 1
+                nchars += len(w)
+                nsylls += k
+                nwords3sylls += k >= 3
+                nwords6chars += len(w) >= 6
+        return np.array([nwords, nsents, nchars, nsylls, nwords3sylls,
+                         nwords6chars], dtype=float)
+
+    def evaluate(self, counts):
+        """Evaluate the measures on a matrix of counts, a row per document.
+
+        The result equals applying each measure to each document.
+        """
+        nwords, nsents, nchars, nsylls, nwords3sylls, nwords6chars = counts.T
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values = {
+                'fleschease': 206.835 - 1.015*(nwords/nsents) -
+                84.6*(nsylls/nwords),
+                'fleschgrade': 11.8*(nsylls/nwords) + 0.39*(nwords/nsents) -
+                15.59,
+                'fogindex': (nwords/nsents) + (nwords3sylls/nwords)*100,
+                'colemanliau': 5.89*(nchars/nwords) -
+                0.3*(nsents/(nwords*100)) - 15.8,
+                'ari': 4.71*(nchars/nwords) + 0.5*(nwords/nsents) - 21.43,
+                'lix': (nwords/nsents) + 100*(nwords6chars/nwords),
+                'smog': 3 + ((nwords3sylls*30)/nsents)**0.5
+            }
+        # Measures are undefined when dividing by zero
+        undefined = (nwords == 0) | (nsents == 0)
+        undefined = {m: undefined for m in values}
+        undefined['colemanliau'] = nwords == 0
+        undefined['smog'] = nsents == 0
+        res = [np.where(undefined[m], self.INF, values[m])
+               for m in self.measures]
+        return np.column_stack(res) if res else np.empty((len(counts), 0))
+
     @classmethod
     def fleschease(cls, tokenized_content):
         """Return the Flesch-Kindaid Reading Ease measure."""
@@ -139,28 +234,33 @@ class ReadabilityMeasures:
         return sum(sum(ReadabilityMeasures.num_syllables(w) for w in s)
                    for s in tokenized_content)
 
+    @staticmethod
+    def syllable_table():
+        """Return the syllable table, loading the default one lazily."""
+        if ReadabilityMeasures.table is None:
+            return default_table()
+        return ReadabilityMeasures.table
+
     @staticmethod
     @lru_cache(maxsize=None)
-    def num_syllables(word):
-        """Return the number of syllables in a word."""
-        if word in ReadabilityMeasures.d:
-            res = mean(len([y for y in x if y[-1].isdigit()])
-                       for x in ReadabilityMeasures.d[word])
-        else:
-            warnings.warn("No '{}' found in CMU corpus".format(word))
-            res = ReadabilityMeasures.avg_syllables(len(word))
+    def num_syllables(word, oov='average'):
+        """Return the number of syllables in a word.
+
+        See the class docstring for the meaning of `oov`.
+        """
+        res = ReadabilityMeasures.syllable_table().get(word)
+        if res is None:
+            if oov == 'heuristic':
+                res = heuristic_syllables(word)
+            else:
+                res = ReadabilityMeasures.avg_syllables(len(word))
         return res
 
     @staticmethod
     @lru_cache(maxsize=None)
     def avg_syllables(wordlen):
         """Return the avg number of syllables of words with given length."""
-        res = [ReadabilityMeasures.num_syllables(w)
-               for w in ReadabilityMeasures.d if len(w) == wordlen]
-        if len(res) == 0:
-            res = [ReadabilityMeasures.num_syllables(w)
-                   for w in ReadabilityMeasures.d]
-        return mean(res)
+        return ReadabilityMeasures.syllable_table().average(wordlen)
 
 
 class TokenizedContent:
@@ -194,17 +294,196 @@ class TokenizedContent:
 
 
 class CountVectorizerWrapper(CountVectorizer):
-    """Wrapper around CountVectorizer class in scikit-learn."""
+    """Wrapper around CountVectorizer class in scikit-learn.
 
-    def __init__(self, *args, **kwargs):
-        super(CountVectorizerWrapper, self).__init__(*args, **kwargs)
+    By default the count matrices are returned as dense arrays. Pass
+    `sparse=True` to get CSR matrices instead. A float `max_features` is
+    taken as the fraction of the vocabulary of the fitted documents to
+    keep, like PrecomputedCountVectorizer does.
+    """
 
-    def fit_transform(self, *args, **kwargs):
-        """Wrapper around fit_transform() method in CountVectorizer."""
-        r = super(CountVectorizerWrapper, self).fit_transform(*args, **kwargs)
-        return r.toarray()
+    def __init__(self, *args, sparse=False, **kwargs):
+        super(CountVectorizerWrapper, self).__init__(*args, **kwargs)
+        self.sparse = sparse
+        self._analyses = None
+
+    @property
+    def is_additive(self):
+        """Whether counts of concatenated documents are the sum of counts.
+
+        This holds for word unigram counts, but not for n-grams spanning
+        document boundaries, character analyzers or binary counts.
+        """
+        return self.analyzer == 'word' and self.ngram_range[1] == 1 and \
+            not self.binary
+
+    @property
+    def is_separable(self):
+        """Whether fitting on several threads at once gives their counts.
+
+        Without a fixed vocabulary, a feature limit or document frequency
+        limits, fitting on many threads only adds columns in which each
+        thread has zero counts.
+        """
+        return self.vocabulary is None and self.max_features is None and \
+            self.min_df == 1 and type(self.min_df) != float and \
+            self.max_df == 1.0 and type(self.max_df) == float
+
+    @property
+    def cache_namespace(self):
+        """Return the namespace of this extractor in a feature cache.
+
+        Only the parameters affecting the analysis of a single document are
+        included, since the cache stores the token counts of documents.
+        Callables are named by module and qualified name. Return None if a
+        callable has no such stable name, e.g. a lambda, so that nothing
+        is cached.
+        """
+        params = [self.analyzer, self.strip_accents, self.lowercase,
+                  self.preprocessor, self.tokenizer, self.stop_words,
+                  self.token_pattern, self.ngram_range]
+        for i, param in enumerate(params):
+            if callable(param):
+                name = getattr(param, '__qualname__', '<unnamed>')
+                # Methods of builtin types have no module of their own
+                owner = getattr(param, '__objclass__', param)
+                module = getattr(param, '__module__', None) or \
+                    getattr(owner, '__module__', None)
+                if '<' in name or module is None:
+                    return None
+                params[i] = '{}.{}'.format(module, name)
+        return 'counts:' + repr(params)
+
+    def build_analyzer(self):
+        """Return the analyzer, reading token counts from cache if set."""
+        analyze = super(CountVectorizerWrapper, self).build_analyzer()
+        if self._analyses is None:
+            return analyze
+
+        def cached_analyze(doc):
+            counts = self._analyses.get(doc)
+            return analyze(doc) if counts is None else counts.elements()
+        return cached_analyze
+
+    def _fit_transform(self, raw_documents, y):
+        """Fit and return the counts, limiting a fraction of features."""
+        max_features = self.max_features
+        if type(max_features) != float:
+            return super(CountVectorizerWrapper, self).fit_transform(
+                raw_documents, y)
+        self.max_features = None
+        try:
+            X = super(CountVectorizerWrapper, self).fit_transform(
+                raw_documents, y)
+        finally:
+            self.max_features = max_features
+        limit = int(max_features * X.shape[1])
+        if limit < X.shape[1]:
+            # Same (unstable) ordering as scikit-learn, so ties match too
+            tfs = np.asarray(X.sum(axis=0)).ravel()
+            columns = np.sort(np.argsort(-tfs)[:limit])
+            terms = sorted(self.vocabulary_, key=self.vocabulary_.get)
+            self.vocabulary_ = {terms[j]: i for i, j in enumerate(columns)}
+            X = X[:, columns]
+        return X
+
+    def _convert(self, r):
+        """Convert a count matrix to the configured output format."""
+        return r.tocsr() if self.sparse else r.toarray()
+
+    def fit_transform(self, raw_documents, y=None, cache=None):
+        """Wrapper around fit_transform() method in CountVectorizer.
+
+        If cache is given, the token counts of each document are looked up
+        in it instead of analyzing the document again. The cache is only
+        used for documents passed as content, and with a cache namespace.
+        """
+        if cache is None or self.input != 'content' or \
+                self.cache_namespace is None:
+            return self._convert(self._fit_transform(raw_documents, y))
+
+        analyze = super(CountVectorizerWrapper, self).build_analyzer()
+        analyses = cache.features(
+            self.cache_namespace, raw_documents,
+            lambda docs: [Counter(analyze(doc)) for doc in docs])
+        self._analyses = dict(zip(raw_documents, analyses))
+        try:
+            r = self._fit_transform(raw_documents, y)
+        finally:
+            self._analyses = None
+        return self._convert(r)
 
     def transform(self, *args, **kwargs):
         """Wrapper around transform() method in CountVectorizer."""
         r = super(CountVectorizerWrapper, self).transform(*args, **kwargs)
-        return r.toarray()
+        return self._convert(r)
+
+
+class PrecomputedCountVectorizer:
+    """Count vectorizer over a fixed corpus, tokenizing it only once.
+
+    The count matrix of the whole corpus is computed up front. Fitting on
+    documents of the corpus then only selects their rows and the columns
+    of their vocabulary, keeping the `max_features` most frequent terms
+    like CountVectorizer does. A float `max_features` is taken as the
+    fraction of the vocabulary of the fitted documents to keep.
+    """
+
+    def __init__(self, corpus, max_features=None, sparse=False, cache=None,
+                 **kwargs):
+        self.max_features = max_features
+        self.sparse = sparse
+        self.vectorizer = CountVectorizerWrapper(sparse=True, **kwargs)
+        if cache is None:
+            self.matrix = self.vectorizer.fit_transform(corpus)
+        else:
+            self.matrix = self.vectorizer.fit_transform(corpus, cache=cache)
+        self.index = {doc: i for i, doc in enumerate(corpus)}
+        self.columns_ = None
+
+    @property
+    def is_additive(self):
+        """Whether counts of concatenated documents are the sum of counts."""
+        return self.vectorizer.is_additive
+
+    @property
+    def is_separable(self):
+        """Whether fitting on several threads at once gives their counts."""
+        return self.max_features is None
+
+    def _rows(self, documents):
+        """Return the count matrix rows of documents in the corpus."""
+        try:
+            rows = [self.index[doc] for doc in documents]
+        except KeyError:
+            raise Exception('Document not found in the corpus')
+        return self.matrix[rows]
+
+    def fit(self, documents):
+        """Select the vocabulary of documents, which must be in the corpus."""
+        X = self._rows(documents)
+        tfs = np.asarray(X.sum(axis=0)).ravel()
+        columns = np.flatnonzero(np.bincount(X.indices,
+                                             minlength=X.shape[1]))
+        limit = self.max_features
+        if type(limit) == float:
+            limit = int(limit * len(columns))
+        if limit is not None and limit < len(columns):
+            # Same (unstable) ordering as scikit-learn, so ties match too
+            top = np.argsort(-tfs[columns])[:limit]
+            columns = np.sort(columns[top])
+        self.columns_ = columns
+        return self
+
+    def transform(self, documents):
+        """Return the counts of documents over the selected vocabulary."""
+        if all(doc in self.index for doc in documents):
+            X = self._rows(documents)
+        else:
+            X = self.vectorizer.transform(documents)
+        X = X[:, self.columns_]
+        return X.tocsr() if self.sparse else X.toarray()
+
+    def fit_transform(self, documents, cache=None):
+        # The corpus is already counted, so cache is not needed here
+        return self.fit(documents).transform(documents)
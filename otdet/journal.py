@@ -0,0 +1,94 @@
+"""
+Persistent journal of crawled pages and posts.
+"""
+
+import hashlib
+import sqlite3
+import time
+
+
+class CrawlJournal:
+    """On-disk record of the pages fetched and posts saved by a crawl.
+
+    For each page, its URL, ETag, Last-Modified date and content hash are
+    kept, so that unchanged pages need not be fetched or parsed again. For
+    each thread, the hashes of its posts are kept along with their numbers,
+    so identical posts are saved only once and new posts are numbered after
+    the existing ones.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._conn = None
+
+    @property
+    def connection(self):
+        """Return the database connection, creating the tables if needed."""
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.filename, timeout=60)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('CREATE TABLE IF NOT EXISTS pages '
+                               '(url TEXT PRIMARY KEY, thread TEXT, '
+                               'page INTEGER, etag TEXT, last_modified TEXT, '
+                               'hash TEXT, fetched REAL)')
+            self._conn.execute('CREATE TABLE IF NOT EXISTS posts '
+                               '(thread TEXT, hash TEXT, number INTEGER, '
+                               'PRIMARY KEY (thread, hash))')
+        return self._conn
+
+    @staticmethod
+    def hash(content):
+        """Return the hash of a page or post content."""
+        return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+    def page(self, url):
+        """Return the (etag, last_modified, hash) of a page, None if new."""
+        return self.connection.execute(
+            'SELECT etag, last_modified, hash FROM pages WHERE url = ?',
+            (url,)).fetchone()
+
+    def last_page(self, thread):
+        """Return the number of the last fetched page of a thread."""
+        return self.connection.execute(
+            'SELECT MAX(page) FROM pages WHERE thread = ?',
+            (thread,)).fetchone()[0]
+
+    def number_posts(self, thread, texts):
+        """Return the (number, text) pairs of posts not yet in a thread.
+
+        New posts are numbered after the existing posts of the thread, in
+        the given order. Nothing is stored until commit() is called.
+        """
+        numbered = {}
+        for text in texts:
+            numbered.setdefault(self.hash(text), text)
+        hashes = list(numbered)
+        known = set()
+        for i in range(0, len(hashes), 500):
+            batch = hashes[i:i+500]
+            query = 'SELECT hash FROM posts WHERE thread = ? AND hash IN ({})'
+            query = query.format(','.join('?'*len(batch)))
+            known.update(h for h, in self.connection.execute(
+                query, [thread] + batch))
+        start = self.connection.execute(
+            'SELECT COALESCE(MAX(number) + 1, 0) FROM posts '
+            'WHERE thread = ?', (thread,)).fetchone()[0]
+        new = [numbered[h] for h in hashes if h not in known]
+        return list(enumerate(new, start))
+
+    def commit(self, thread, posts, pages):
+        """Record numbered posts and fetched pages of a thread.
+
+        posts are (number, text) pairs and pages are (url, page, etag,
+        last_modified, hash) tuples. Everything is recorded in a single
+        transaction.
+        """
+        now = time.time()
+        with self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO posts VALUES (?, ?, ?)',
+                [(thread, self.hash(text), number) for number, text in posts])
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [(url, thread, page, etag, last_modified, content_hash, now)
+                 for url, page, etag, last_modified, content_hash in pages])
@@ -0,0 +1,147 @@
+"""
+Packed threads, storing all posts of a thread in a single file.
+
+A pack file starts with a header of the magic bytes, the flags and the
+number n of posts, followed by the n post numbers as int64, the n+1 offsets
+of the posts in the data section as uint64 and the data section, i.e. the
+UTF-8 posts (each compressed with zlib if the COMPRESSED flag is set). All
+integers are little-endian and the posts are ordered by number.
+"""
+
+import mmap
+import os
+import os.path
+import struct
+import tempfile
+import zlib
+
+import numpy as np
+
+from otdet.util import PostIndex
+
+
+MAGIC = b'OTDPACK1'
+HEADER = struct.Struct('<8sII')
+COMPRESSED = 1
+EXTENSION = '.pack'
+
+
+def is_pack(filename):
+    """Tell whether a file is a pack file."""
+    if not os.path.isfile(filename):
+        return False
+    with open(filename, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def write_pack(filename, posts, numbers=None, compress=False):
+    """Write posts, numbered from 0 unless numbers are given, to a pack file.
+
+    The file is written to a temporary file first and renamed into place.
+    """
+    data = [post.encode('utf-8') for post in posts]
+    if compress:
+        data = [zlib.compress(d) for d in data]
+    if numbers is None:
+        numbers = np.arange(len(data))
+    numbers = np.asarray(numbers, dtype='<i8')
+    if len(numbers) != len(data):
+        raise Exception('There should be a number for each post')
+    order = np.argsort(numbers, kind='mergesort')
+    offsets = np.zeros(len(data) + 1, dtype='<u8')
+    np.cumsum([len(data[i]) for i in order], out=offsets[1:])
+
+    dirname = os.path.dirname(os.path.abspath(filename))
+    fd, tmpname = tempfile.mkstemp(dir=dirname, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, COMPRESSED if compress else 0,
+                                len(data)))
+            f.write(numbers[order].tobytes())
+            f.write(offsets.tobytes())
+            for i in order:
+                f.write(data[i])
+        # mkstemp makes the file private, unlike files made by open
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmpname, 0o666 & ~umask)
+        os.replace(tmpname, filename)
+    except BaseException:
+        os.remove(tmpname)
+        raise
+
+
+def pack_directory(dirname, filename, compress=False):
+    """Pack the post files of a thread directory into a pack file."""
+    index = PostIndex.from_dir(dirname)
+    posts = []
+    for name in index.filenames:
+        with open(name) as f:
+            posts.append(f.read())
+    write_pack(filename, posts, index.numbers, compress=compress)
+
+
+class PackedThread:
+    """Posts of a thread in a pack file, read through a memory map.
+
+    Only the index is read when opening the file. A post is read, and
+    decompressed, when it is accessed.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, flags, n = HEADER.unpack_from(self._mmap)
+        except struct.error:
+            magic = None
+        if magic != MAGIC:
+            self._mmap.close()
+            raise Exception('Not a pack file: {}'.format(filename))
+        self.compressed = bool(flags & COMPRESSED)
+        self.numbers = np.frombuffer(self._mmap, dtype='<i8', count=n,
+                                     offset=HEADER.size)
+        self.offsets = np.frombuffer(self._mmap, dtype='<u8', count=n+1,
+                                     offset=HEADER.size + 8*n)
+        self._start = HEADER.size + 8*(2*n + 1)
+
+    def __len__(self):
+        return len(self.numbers)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('post index out of range')
+        start = self._start + int(self.offsets[i])
+        data = self._mmap[start:self._start + int(self.offsets[i+1])]
+        if self.compressed:
+            data = zlib.decompress(data)
+        return data.decode('utf-8')
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def posts(self, k=None):
+        """Return the first k posts (all posts if k is None)."""
+        return tuple(self[i] for i in range(len(self))[:k])
+
+    def __getstate__(self):
+        # The memory map is opened again when unpickled
+        return self.filename
+
+    def __setstate__(self, filename):
+        self.__init__(filename)
+
+    def close(self):
+        """Close the memory map."""
+        # The arrays viewing the memory map must go first
+        self.numbers = self.offsets = None
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
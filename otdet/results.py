@@ -0,0 +1,53 @@
+"""
+Persistent store of experiment results.
+"""
+
+import hashlib
+import os
+import os.path
+import tempfile
+
+import numpy as np
+
+
+class ResultStore:
+    """Directory of experiment results, one file of arrays per setting.
+
+    Results are written as soon as a setting is done, each to a temporary
+    file atomically renamed into place, so an interrupted sweep leaves only
+    complete results behind and can be resumed by skipping the settings
+    already stored. A setting is identified by the repr of any object
+    describing it.
+    """
+
+    def __init__(self, dirname):
+        self.dirname = dirname
+        os.makedirs(dirname, exist_ok=True)
+
+    @staticmethod
+    def key(setting):
+        """Return the key of a setting."""
+        return hashlib.sha1(repr(setting).encode('utf-8')).hexdigest()
+
+    def path(self, setting):
+        """Return the file name of the results of a setting."""
+        return os.path.join(self.dirname, self.key(setting) + '.npz')
+
+    def __contains__(self, setting):
+        return os.path.exists(self.path(setting))
+
+    def save(self, setting, **arrays):
+        """Store the result arrays of a setting."""
+        fd, tmpname = tempfile.mkstemp(dir=self.dirname, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, **arrays)
+            os.replace(tmpname, self.path(setting))
+        except BaseException:
+            os.remove(tmpname)
+            raise
+
+    def load(self, setting):
+        """Return a dict of the result arrays of a setting."""
+        with np.load(self.path(setting)) as data:
+            return {name: data[name] for name in data.files}
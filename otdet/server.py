@@ -0,0 +1,213 @@
+"""
+Long-running HTTP service scoring threads.
+"""
+
+from collections import namedtuple, OrderedDict
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import json
+import queue
+from socketserver import ThreadingMixIn
+import threading
+import time
+
+from otdet.cli import ranking
+from otdet.distance import METRICS
+
+
+ScoringRequest = namedtuple('ScoringRequest', ['posts', 'method', 'metric',
+                                               'future'])
+
+
+class ScoringService:
+    """Score threads submitted concurrently in micro-batches.
+
+    A single background thread takes the submitted threads off a queue and
+    scores those arriving within `max_delay` seconds of each other, up to
+    `max_batch` of them, in one call to the detector's score_threads. The
+    detector thus stays loaded between requests.
+    """
+
+    WARM_UP_THREAD = ['Warming up the detector.', 'Loading all models now.']
+
+    def __init__(self, detector, method='clust_dist', metric='euclidean',
+                 max_batch=64, max_delay=0.005):
+        self.detector = detector
+        self.method = method
+        self.metric = metric
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue = queue.Queue()
+        self._thread = None
+
+    def warm_up(self):
+        """Score a dummy thread so models are loaded before any request."""
+        self.detector.score_threads([self.WARM_UP_THREAD], self.method,
+                                    self.metric)
+
+    def start(self):
+        """Start the thread scoring the submitted threads."""
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Score the threads submitted so far, then stop."""
+        self._queue.put(None)
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def submit(self, posts, method=None, metric=None):
+        """Submit a thread and return a future of its scores.
+
+        The result of the future is a pair of the scores and the number of
+        threads scored in the same batch.
+        """
+        request = ScoringRequest(list(posts), method or self.method,
+                                 metric or self.metric, Future())
+        self._queue.put(request)
+        return request.future
+
+    def _next_batch(self):
+        """Wait for requests and return a batch of them (None to stop)."""
+        request = self._queue.get()
+        if request is None:
+            return None
+        batch = [request]
+        deadline = time.perf_counter() + self.max_delay
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.perf_counter()
+            try:
+                request = self._queue.get(timeout=max(timeout, 0))
+            except queue.Empty:
+                break
+            if request is None:
+                # Stop after this batch
+                self._queue.put(None)
+                break
+            batch.append(request)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                break
+            self._score_safely(batch)
+
+    def _score(self, batch):
+        """Score a batch of requests, grouped by method and metric."""
+        groups = OrderedDict()
+        for request in batch:
+            key = (request.method, request.metric)
+            groups.setdefault(key, []).append(request)
+        for (method, metric), requests in groups.items():
+            threads = [request.posts for request in requests]
+            try:
+                all_scores = self.detector.score_threads(threads, method,
+                                                         metric)
+            except Exception as e:
+                if len(requests) == 1:
+                    requests[0].future.set_exception(e)
+                else:
+                    # Find out which threads fail by scoring them one by one
+                    for request in requests:
+                        self._score_safely([request])
+                continue
+            for request, scores in zip(requests, all_scores):
+                request.future.set_result((scores, len(batch)))
+
+    def _score_safely(self, batch):
+        """Score a batch, passing any error to the pending requests."""
+        try:
+            self._score(batch)
+        except Exception as e:
+            for request in batch:
+                if not request.future.done():
+                    request.future.set_exception(e)
+
+
+class ScoringHandler(BaseHTTPRequestHandler):
+    """Handle requests to score a thread.
+
+    POST /score takes a JSON object with the list of "posts" of a thread
+    and optionally the "method", "metric" and "top" number of posts to
+    return. The response contains the ranked posts, the number of threads
+    scored in the same batch and the latency of the request in ms.
+    GET /health tells whether the service is up.
+    """
+
+    TIMEOUT = 60    # Max seconds to wait for the scores
+
+    def _send_json(self, code, obj):
+        body = json.dumps(obj).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _parse(self):
+        """Return the arguments of a scoring request, checking them."""
+        length = int(self.headers.get('Content-Length', 0))
+        obj = json.loads(self.rfile.read(length).decode('utf-8'))
+        if not isinstance(obj, dict):
+            raise ValueError('Request should be a JSON object')
+        posts = obj.get('posts')
+        if not isinstance(posts, list) or \
+                not all(isinstance(post, str) for post in posts):
+            raise ValueError('"posts" should be a list of strings')
+        method, metric = obj.get('method'), obj.get('metric')
+        if method is not None and method not in self.server.methods:
+            raise ValueError("Unsupported method: '{}'".format(method))
+        if metric is not None and metric not in METRICS:
+            raise ValueError("Unsupported metric: '{}'".format(metric))
+        top = obj.get('top')
+        if top is not None and (type(top) != int or top < 0):
+            raise ValueError('"top" should be a non-negative integer')
+        return posts, method, metric, top
+
+    def do_GET(self):
+        if self.path != '/health':
+            self._send_json(404, {'error': 'Not found'})
+        else:
+            self._send_json(200, {'status': 'ok'})
+
+    def do_POST(self):
+        start = time.perf_counter()
+        if self.path != '/score':
+            self._send_json(404, {'error': 'Not found'})
+            return
+        try:
+            posts, method, metric, top = self._parse()
+        except ValueError as e:
+            self._send_json(400, {'error': str(e)})
+            return
+        future = self.server.service.submit(posts, method, metric)
+        try:
+            scores, batch_size = future.result(self.TIMEOUT)
+        except Exception as e:
+            self._send_json(500, {'error': str(e)})
+            return
+        latency = (time.perf_counter() - start) * 1000
+        self._send_json(200, {'ranking': ranking(scores, top),
+                              'batch_size': batch_size,
+                              'latency_ms': latency})
+        self.log_message('scored %d posts in %.1f ms (batch of %d)',
+                         len(posts), latency, batch_size)
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super(ScoringHandler, self).log_message(format, *args)
+
+
+class ScoringServer(ThreadingMixIn, HTTPServer):
+    """HTTP server handling each request in its own thread."""
+
+    daemon_threads = True
+
+    def __init__(self, address, service, quiet=False):
+        super(ScoringServer, self).__init__(address, ScoringHandler)
+        self.service = service
+        self.methods = service.detector.METHODS
+        self.quiet = quiet
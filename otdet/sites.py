@@ -0,0 +1,208 @@
+"""
+Forum sites from which threads can be scraped.
+"""
+
+from bs4 import BeautifulSoup
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+
+
+BACKENDS = ['lxml', 'bs4']
+
+# Text nodes of an element, except those BeautifulSoup leaves out of
+# stripped_strings
+TEXT_XPATH = './/text()[not(ancestor::script) and not(ancestor::style)]'
+
+
+def class_xpath(name):
+    """Return an XPath predicate matching elements of a CSS class."""
+    return "contains(concat(' ', normalize-space(@class), ' '), ' {} ')"\
+        .format(name)
+
+
+def element_text(element):
+    """Return the stripped strings of an lxml element, one per line."""
+    strings = (text.strip() for text in element.xpath(TEXT_XPATH))
+    return '\n'.join(text for text in strings if text) + '\n'
+
+
+class Site:
+    """How to find the pages of a thread and the posts in a page.
+
+    Subclasses define the URL of a thread page and how to find the tags
+    containing posts: a filter for the BeautifulSoup backend and an XPath
+    for the lxml backend, which both extract the same text. The lxml
+    backend is much faster and used by default if lxml is installed.
+    `base_url` may be given to scrape a mirror.
+    """
+
+    name = None
+    base_url = None
+    post_xpath = None
+
+    def __init__(self, base_url=None, backend=None):
+        if base_url is not None:
+            self.base_url = base_url.rstrip('/')
+        if backend is None:
+            backend = 'bs4' if lxml is None or self.post_xpath is None \
+                else 'lxml'
+        if backend not in BACKENDS:
+            raise Exception('Unknown backend: {}'.format(backend))
+        if backend == 'lxml' and lxml is None:
+            raise Exception('lxml is not installed')
+        self.backend = backend
+
+    def page_url(self, thread_id, page):
+        """Return the URL and query parameters of a thread page."""
+        raise NotImplementedError
+
+    @staticmethod
+    def post_filter(tag):
+        """Filter tag containing a post."""
+        raise NotImplementedError
+
+    @staticmethod
+    def post_text(post):
+        """Return the text of a post, as saved in a post file."""
+        return '\n'.join(list(post.stripped_strings)) + '\n'
+
+    @staticmethod
+    def element_text(element):
+        """Return the text of a post lxml element."""
+        return element_text(element)
+
+    def parse(self, html):
+        """Return the text of each post in a page."""
+        if self.backend == 'lxml':
+            return self.parse_lxml(html)
+        return self.parse_bs4(html)
+
+    def parse_bs4(self, html):
+        """Return the text of each post in a page, using BeautifulSoup."""
+        soup = BeautifulSoup(html)
+        return [self.post_text(post)
+                for post in soup.find_all(self.post_filter)]
+
+    def parse_lxml(self, html):
+        """Return the text of each post in a page, using lxml."""
+        if not html.strip():
+            return []
+        # Parse bytes so that pages with an encoding declaration are allowed
+        parser = lxml.html.HTMLParser(encoding='utf-8')
+        tree = lxml.html.document_fromstring(html.encode('utf-8'), parser)
+        return [self.element_text(post)
+                for post in tree.xpath(self.post_xpath)]
+
+
+class ArchLinux(Site):
+    name = 'archlinux'
+    base_url = 'https://bbs.archlinux.org'
+    post_xpath = "//div[normalize-space(@class) = 'postmsg']"
+
+    def page_url(self, thread_id, page):
+        return (self.base_url + '/viewtopic.php',
+                {'id': thread_id, 'p': page})
+
+    @staticmethod
+    def post_filter(tag):
+        """Filter tag containing a post."""
+
+        def only_one_postmsg_class(attr):
+            if isinstance(attr, str):
+                return attr == 'postmsg'
+            return len(attr) == 1 and attr[0] == 'postmsg'
+
+        return tag.name == 'div' and tag.has_attr('class') and\
+            only_one_postmsg_class(tag['class'])
+
+    @staticmethod
+    def text_filter(tag):
+        """Filter tag containing text."""
+        return tag.name == 'p' and not tag.has_attr('class')
+
+    @classmethod
+    def post_text(cls, post):
+        pstr = [p.stripped_strings for p in post.descendants
+                if cls.text_filter(p)]
+        return ''.join('\n'.join(text) + '\n' for text in pstr)
+
+    @staticmethod
+    def element_text(element):
+        return ''.join(element_text(p)
+                       for p in element.xpath('.//p[not(@class)]'))
+
+
+class MovieForums(Site):
+    name = 'movieforums'
+    base_url = 'http://www.movieforums.com'
+    post_xpath = "//div[starts-with(@id, 'post_message_') and " \
+        "not(contains(@id, 'ad'))]"
+
+    def page_url(self, thread_id, page):
+        return (self.base_url + '/community/showthread.php',
+                {'t': thread_id, 'page': page})
+
+    @staticmethod
+    def post_filter(tag):
+        return tag.name == 'div' and tag.has_attr('id') and \
+            tag['id'].startswith('post_message_') and \
+            'ad' not in tag['id']
+
+
+class MusicBoards(Site):
+    name = 'musicboards'
+    base_url = 'http://www.musicboards.com'
+    post_xpath = "//blockquote[{} and not({})]".format(
+        class_xpath('postcontent'), class_xpath('lastedited'))
+
+    def page_url(self, thread_id, page):
+        url = '{}/showthread.php/{}/page{}'
+        return url.format(self.base_url, thread_id, page), None
+
+    @staticmethod
+    def post_filter(tag):
+        """Filter tag containing post."""
+        if tag.name != 'blockquote':
+            return False
+        if not tag.has_attr('class'):
+            return False
+        if isinstance(tag['class'], str):
+            return tag['class'] == 'postcontent'
+        else:
+            return 'postcontent' in tag['class'] and \
+                   'lastedited' not in tag['class']
+
+
+class XenForoSite(Site):
+    """Site running XenForo, with posts in messageText blockquotes."""
+
+    post_xpath = "//blockquote[{}]".format(class_xpath('messageText'))
+
+    def page_url(self, thread_id, page):
+        url = '{}/threads/{}/page-{}'
+        return url.format(self.base_url, thread_id, page), None
+
+    @staticmethod
+    def post_filter(tag):
+        if tag.name != 'blockquote':
+            return False
+        if not tag.has_attr('class'):
+            return False
+        return isinstance(tag['class'], list) and \
+            'messageText' in tag['class']
+
+
+class PhysicsForums(XenForoSite):
+    name = 'physicsforums'
+    base_url = 'https://www.physicsforums.com'
+
+
+class ReligiousForums(XenForoSite):
+    name = 'religiousforums'
+    base_url = 'https://www.religiousforums.com'
+
+
+SITES = {site.name: site for site in [ArchLinux, MovieForums, MusicBoards,
+                                      PhysicsForums, ReligiousForums]}
@@ -0,0 +1,136 @@
+"""
+Compact lookup table of the number of syllables of words.
+"""
+
+from functools import lru_cache
+import os
+import os.path
+import re
+from statistics import mean
+
+import numpy as np
+
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            'data', 'syllables')
+
+
+class SyllableTable:
+    """Sorted table of the average number of syllables of words.
+
+    Words are stored as a sorted array of fixed-width UTF-8 strings and
+    looked up by binary search. The average number of syllables of words
+    of each length is precomputed too. A saved table is memory-mapped when
+    loaded, so its pages are shared by every process using it.
+    """
+
+    def __init__(self, words, syllables, averages=None):
+        self.words = words
+        self.syllables = syllables
+        if averages is None:
+            averages = self._averages(words, syllables)
+        self.averages = averages
+
+    @staticmethod
+    def _averages(words, syllables):
+        """Return the avg number of syllables of words of each length.
+
+        The k-th element is the average over words of length k, or over all
+        words if there is no such word. The last element is always the
+        average over all words, standing for every longer length.
+        """
+        lengths = np.char.str_len(np.char.decode(words, 'utf-8'))
+        size = (np.max(lengths) if len(lengths) > 0 else 0) + 2
+        totals = np.bincount(lengths, weights=syllables, minlength=size)
+        counts = np.bincount(lengths, minlength=size)
+        with np.errstate(invalid='ignore'):
+            overall = np.mean(syllables) if len(syllables) > 0 else np.nan
+        return np.where(counts > 0, totals/np.maximum(counts, 1), overall)
+
+    def __len__(self):
+        return len(self.words)
+
+    def __contains__(self, word):
+        return self.get(word) is not None
+
+    @classmethod
+    def from_dict(cls, d):
+        """Build the table from a pronouncing dictionary like cmudict.dict().
+
+        The number of syllables of a word is the number of stressed phonemes
+        averaged over its pronunciations.
+        """
+        items = sorted((word.encode('utf-8'),
+                        mean(len([y for y in x if y[-1].isdigit()])
+                             for x in prons))
+                       for word, prons in d.items())
+        words = np.array([w for w, _ in items], dtype=bytes)
+        if len(words) == 0:
+            words = words.astype('S1')
+        syllables = np.array([k for _, k in items], dtype=float)
+        return cls(words, syllables)
+
+    @classmethod
+    def load(cls, dirname):
+        """Load a saved table, memory-mapping its arrays."""
+        words = np.load(os.path.join(dirname, 'words.npy'), mmap_mode='r')
+        syllables = np.load(os.path.join(dirname, 'syllables.npy'),
+                            mmap_mode='r')
+        filename = os.path.join(dirname, 'averages.npy')
+        averages = np.load(filename) if os.path.exists(filename) else None
+        return cls(words, syllables, averages)
+
+    def save(self, dirname):
+        """Save the table as NumPy arrays in a directory."""
+        os.makedirs(dirname, exist_ok=True)
+        np.save(os.path.join(dirname, 'words.npy'), self.words)
+        np.save(os.path.join(dirname, 'syllables.npy'), self.syllables)
+        np.save(os.path.join(dirname, 'averages.npy'), self.averages)
+
+    def get(self, word, default=None):
+        """Return the number of syllables of a word, default if not found."""
+        key = word.encode('utf-8')
+        if len(key) > self.words.dtype.itemsize:
+            return default
+        i = np.searchsorted(self.words, key)
+        if i < len(self.words) and self.words[i] == key:
+            return float(self.syllables[i])
+        return default
+
+    def average(self, wordlen):
+        """Return the avg number of syllables of words with given length.
+
+        If there is no such word, return the average over all words.
+        """
+        return float(self.averages[min(wordlen, len(self.averages)-1)])
+
+
+VOWEL_GROUP = re.compile('[aeiouy]+')
+
+
+def heuristic_syllables(word):
+    """Estimate the number of syllables of a word from its spelling.
+
+    Each group of consecutive vowels counts as a syllable, except a silent
+    final 'e'. Every word has at least one syllable.
+    """
+    word = word.lower()
+    res = len(VOWEL_GROUP.findall(word))
+    if word.endswith('e') and not word.endswith(('le', 'ee')) and res > 1:
+        res -= 1
+    return max(res, 1)
+
+
+@lru_cache(maxsize=None)
+def default_table():
+    """Return the default syllable table, loading it on first use.
+
+    The table saved by bin/build_syllable_table.py (at DEFAULT_PATH or the
+    directory in the OTDET_SYLLABLE_TABLE environment variable) is used if
+    present. Otherwise the table is built from NLTK's CMU dictionary.
+    """
+    dirname = os.environ.get('OTDET_SYLLABLE_TABLE', DEFAULT_PATH)
+    if os.path.exists(os.path.join(dirname, 'words.npy')):
+        return SyllableTable.load(dirname)
+    from nltk.corpus import cmudict
+    return SyllableTable.from_dict(cmudict.dict())
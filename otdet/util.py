@@ -1,19 +1,106 @@
 #!/usr/bin/env python
 
+from glob import glob
+import os.path
 import random
 import re
 
+import numpy as np
 
-def pick(filenames, k=1, randomized=True):
-    """Pick some thread files from a thread directory."""
+
+def post_number(filename):
+    """Return the number of a post file, e.g. 3 for 'post-3.txt'."""
+    return int(re.search('([0-9]+)\.txt', filename).group(1))
+
+
+def check_random_state(random_state):
+    """Return a random.Random from a seed, or the random module if None."""
+    if random_state is None:
+        return random
+    if isinstance(random_state, random.Random):
+        return random_state
+    return random.Random(random_state)
+
+
+def sample(n, k, random_state=None):
+    """Return k distinct positions out of n, in random order.
+
+    Only O(k) random numbers are drawn, instead of shuffling all positions.
+    All positions are returned if k > n.
+    """
+    if k < 0:
+        raise Exception('k should be non-negative')
+    rng = check_random_state(random_state)
+    return rng.sample(range(n), min(k, n))
+
+
+def stratified_sample(sizes, k, random_state=None):
+    """Return k (stratum, position) pairs sampled across strata.
+
+    Each stratum, e.g. a thread, of the given size gets a share of the
+    sample proportional to its size, the remainder going to the strata with
+    the largest fractional shares. Pairs are ordered by stratum.
+    """
+    if k < 0:
+        raise Exception('k should be non-negative')
+    sizes = np.asarray(sizes, dtype=np.int64)
+    k = min(k, int(sizes.sum()))
+    if k == 0:
+        return []
+    shares = k * sizes / sizes.sum()
+    counts = np.floor(shares).astype(np.int64)
+    remainder = np.argsort(counts - shares, kind='mergesort')
+    counts[remainder[:k - counts.sum()]] += 1
+    rng = check_random_state(random_state)
+    return [(stratum, position)
+            for stratum, (size, count) in enumerate(zip(sizes, counts))
+            for position in rng.sample(range(size), count)]
+
+
+class PostIndex:
+    """Post files of a thread ordered by number, parsed only once.
+
+    Selections return filenames without sorting or shuffling them again.
+    """
+
+    def __init__(self, filenames):
+        numbers = np.array([post_number(f) for f in filenames],
+                           dtype=np.int64)
+        order = np.argsort(numbers, kind='mergesort')
+        self.numbers = numbers[order]
+        self.filenames = tuple(filenames[i] for i in order)
+
+    @classmethod
+    def from_dir(cls, dirname):
+        """Return the index of the post files of a thread directory."""
+        return cls(glob(os.path.join(dirname, '*.txt')))
+
+    def __len__(self):
+        return len(self.filenames)
+
+    def first(self, k):
+        """Return the filenames of the first k posts."""
+        if k < 0:
+            raise Exception('k should be non-negative')
+        return self.filenames[:k]
+
+    def sample(self, k, random_state=None):
+        """Return the filenames of k posts sampled at random."""
+        return tuple(self.filenames[i]
+                     for i in sample(len(self), k, random_state))
+
+
+def pick(filenames, k=1, randomized=True, random_state=None):
+    """Pick some thread files from a thread directory.
+
+    The given list is left as is.
+    """
     if k < 0:
         raise Exception('k should be non-negative')
     if randomized:
-        random.shuffle(filenames)
-    else:
-        pattern = '([0-9]+)\.txt'
-        filenames.sort(key=lambda f: int(re.search(pattern, f).group(1)))
-    return filenames[:k]
+        return [filenames[i]
+                for i in sample(len(filenames), k, random_state)]
+    return list(PostIndex(filenames).first(k))
 
 
 class lazyproperty:
@@ -1,80 +1,161 @@
 #!/usr/bin/env python
 
 import argparse
-from collections import namedtuple
-from glob import glob
+from collections import namedtuple, OrderedDict
+import copy
+from functools import lru_cache
 import itertools as it
+from multiprocessing import Pool
 import os
 import os.path
 import random
+import shutil
+import sys
 
 import numpy as np
 import pandas as pd
 
+from otdet.cache import FeatureCache
+from otdet.corpus import Corpus
 from otdet.detector import OOTDetector
-from otdet.evaluation import TopListEvaluator
+from otdet.evaluation import rank_posts, TIES, TopListEvaluator
 from otdet.feature_extraction import (ReadabilityMeasures,
-                                      CountVectorizerWrapper)
-from otdet.util import pick
+                                      PrecomputedCountVectorizer)
+from otdet.pack import EXTENSION
+from otdet.results import ResultStore
+from otdet.util import sample, stratified_sample
 
 
-def experiment(setting, niter):
-    """Do experiment with the specified setting."""
+names = ['method', 'feature', 'max_features', 'metric', 'norm_dir',
+         'oot_dir', 'num_norm', 'num_oot', 'num_top']
+ExprSetting = namedtuple('ExprSetting', names)
+
+# Ways of sampling OOT posts
+SAMPLINGS = ['shuffle', 'sample']
+# Separator of the threads from which OOT posts of a setting are taken
+OOT_SEP = '+'
+
+# Posts of all thread directories, shared by every setting and worker
+corpus = Corpus()
+# Persistent cache of document features (None to disable)
+feature_cache = None
+
+
+def init_worker(shared_corpus, shared_feature_cache):
+    """Make a worker process use the corpus loaded by the main process."""
+    global corpus, feature_cache
+    corpus = shared_corpus
+    feature_cache = shared_feature_cache
+
+
+def oot_posts(oot_dir):
+    """Return the posts OOT posts are sampled from, for each OOT thread."""
+    return [corpus.posts(dirname, 10000)
+            for dirname in oot_dir.split(OOT_SEP)]
+
+
+@lru_cache(maxsize=None)
+def corpus_counts(norm_dir, num_norm, oot_dir):
+    """Return the unigram counts of all posts a setting may sample from.
+
+    The result is cached, so each process tokenizes these posts only once.
+    """
+    documents = corpus.posts(norm_dir, num_norm) + \
+        sum(oot_posts(oot_dir), ())
+    return PrecomputedCountVectorizer(documents, cache=feature_cache,
+                                      input='content', stop_words='english')
+
+
+def iteration_seed(seed, setting, jj):
+    """Return the random seed of the jj-th iteration of a setting.
+
+    The seed depends only on the posts sampled by the setting, so every
+    method, metric and feature is evaluated on the same samples. Return
+    None (unseeded) if seed is None.
+    """
+    if seed is None:
+        return None
+    return '{}:{}:{}:{}:{}:{}'.format(seed, setting.norm_dir,
+                                      setting.oot_dir, setting.num_norm,
+                                      setting.num_oot, jj)
+
+
+def experiment(setting, seed=None, ties='best', sampling='shuffle'):
+    """Do one iteration of experiment with the specified setting.
+
+    OOT posts are taken from a shuffle of all posts of the OOT thread, like
+    earlier versions did, or sampled with O(num_oot) random numbers if
+    sampling is 'sample'. If oot_dir joins several threads with OOT_SEP,
+    each thread gives a share of the OOT posts proportional to its size.
+    Return the indices of the posts from the most off-topic, where the
+    first num_norm posts are the normal ones.
+    """
     # Obtain normal and OOT posts
-    norm_files = pick(glob(os.path.join(setting.norm_dir, '*.txt')),
-                      k=setting.num_norm, randomized=False)
-    oot_files = pick(glob(os.path.join(setting.oot_dir, '*.txt')),
-                     k=10000, randomized=False)
-
-    # Read their contents
-    norm_docs = []
-    for file in norm_files:
-        with open(file) as f:
-            norm_docs.append(f.read())
-    oot_docs = []
-    for file in oot_files:
-        with open(file) as f:
-            oot_docs.append(f.read())
-
-    res = []
-    for jj in range(niter):
-        # Shuffle OOT posts
-        random.shuffle(oot_docs)
-
-        # Combine them both
-        documents = norm_docs + oot_docs[:setting.num_oot]
-        is_oot = [False]*setting.num_norm + [True]*setting.num_oot
-
-        # Apply OOT post detection methods
-        if setting.feature == 'unigram':
-            max_features = setting.max_features
-            if max_features is not None:
-                try:
-                    max_features = int(max_features)
-                except ValueError:
-                    max_features = float(max_features)
-            if type(max_features) == float:
-                extractor = CountVectorizerWrapper(input='content',
-                                                   stop_words='english')
-                extractor.fit(documents)
-                num_features = len(extractor.vocabulary_)
-                max_features = int(max_features * num_features)
-            extractor = CountVectorizerWrapper(input='content',
-                                               stop_words='english',
-                                               max_features=max_features)
-            detector = OOTDetector(extractor=extractor)
-        else:
-            extractor = ReadabilityMeasures()
-            detector = OOTDetector(extractor=extractor)
-        func = getattr(detector, setting.method)
-        distances = func(documents, metric=setting.metric)
-
-        # Construct ranked list of OOT posts (1: most off-topic)
-        # In case of tie, prioritize normal post (worst case)
-        s = sorted(zip(distances, is_oot), key=lambda x: x[1])
-        subresult = sorted(s, reverse=True)
-        res.append(subresult)
-    return res
+    norm_docs = corpus.posts(setting.norm_dir, setting.num_norm)
+    oot_threads = oot_posts(setting.oot_dir)
+
+    # Sample OOT posts
+    rng = random.Random(seed)
+    if len(oot_threads) > 1:
+        oot_docs = [oot_threads[t][i] for t, i in stratified_sample(
+            [len(posts) for posts in oot_threads], setting.num_oot, rng)]
+    elif sampling == 'shuffle':
+        oot_docs = list(oot_threads[0])
+        rng.shuffle(oot_docs)
+        oot_docs = oot_docs[:setting.num_oot]
+    else:
+        oot_docs = [oot_threads[0][i] for i in
+                    sample(len(oot_threads[0]), setting.num_oot, rng)]
+
+    # Combine them both
+    documents = list(norm_docs) + oot_docs
+    is_oot = [False]*setting.num_norm + [True]*setting.num_oot
+
+    # Apply OOT post detection methods
+    if setting.feature == 'unigram':
+        max_features = setting.max_features
+        if max_features is not None:
+            try:
+                max_features = int(max_features)
+            except ValueError:
+                max_features = float(max_features)
+        # Share the precomputed counts, only the vocabulary size differs
+        extractor = copy.copy(corpus_counts(setting.norm_dir,
+                                            setting.num_norm,
+                                            setting.oot_dir))
+        extractor.max_features = max_features
+        detector = OOTDetector(extractor=extractor, cache=feature_cache)
+    else:
+        extractor = ReadabilityMeasures()
+        detector = OOTDetector(extractor=extractor, cache=feature_cache)
+    func = getattr(detector, setting.method)
+    distances = func(documents, metric=setting.metric)
+
+    # Construct ranked list of OOT posts (first: most off-topic)
+    random_state = None
+    if ties == 'random':
+        random_state = np.random.RandomState(rng.randrange(2**32))
+    order = rank_posts(distances, is_oot, ties, random_state)
+    return order.astype(np.int32)
+
+
+def result_key(setting, args):
+    """Return what identifies the stored result of a setting."""
+    return (tuple(setting), args.niter, args.seed, args.ties, args.sampling)
+
+
+def run_task(task):
+    """Run an experiment task of a setting, a seed, ties and sampling."""
+    return experiment(*task)
+
+
+def progress(iterable, total):
+    """Report the progress of consuming an iterable to stderr."""
+    for i, item in enumerate(iterable, 1):
+        end = '\n' if i == total else ''
+        print('\r{}/{} iterations done'.format(i, total), end=end,
+              file=sys.stderr)
+        yield item
 
 
 def evaluate(result, setting):
@@ -82,16 +163,19 @@ def evaluate(result, setting):
     n = setting.num_oot
     M = setting.num_norm + n
     N = setting.num_top
-    evaluator = TopListEvaluator(result, M=M, n=n, N=N)
+    is_oot = np.array(result) >= setting.num_norm
+    evaluator = TopListEvaluator(is_oot, M=M, n=n, N=N)
     return (evaluator.baseline, evaluator.performance,
             evaluator.min_sup, evaluator.max_sup)
 
 
 def shorten(dirname):
-    """Shorten a thread directory name."""
+    """Shorten a thread directory or pack file name."""
     split_path = dirname.split(os.sep)
     thread, post = (split_path[-2], split_path[-1]) if split_path[-1] != '' \
         else (split_path[-3], split_path[-2])
+    if post.endswith(EXTENSION):
+        post = post[:-len(EXTENSION)]
     post_id = post.split('__')[0]
     return thread[:3] + post_id
 
@@ -100,10 +184,12 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Run experiment with given '
                                      'settings')
     parser.add_argument('-nd', '--norm-dir', type=str, nargs='+',
-                        required=True, help='Normal thread directory')
+                        required=True, help='Normal thread directory or '
+                        'pack file')
     parser.add_argument('-od', '--oot-dir', type=str, nargs='+', required=True,
-                        help='Thread directory from which '
-                        'OOT post will be taken')
+                        help='Thread directory or pack file from which '
+                        'OOT post will be taken, or several joined by "+" '
+                        'to sample across them in proportion to their sizes')
     parser.add_argument('-m', '--num-norm', type=int, nargs='+', required=True,
                         help='Number of posts taken from '
                         'normal thread directory')
@@ -128,6 +214,26 @@ if __name__ == '__main__':
                         help='Number of iteration for each method')
     parser.add_argument('-j', '--jobs', type=int, default=1,
                         help='Number of work processes')
+    parser.add_argument('--seed', type=str, default=None,
+                        help='Seed making the sampled OOT posts '
+                        'reproducible')
+    parser.add_argument('--feature-cache', type=str, default=None,
+                        help='SQLite file caching document features '
+                        'across runs')
+    parser.add_argument('--ties', type=str, default='best', choices=TIES,
+                        help='How to rank posts with equal distances '
+                        '(default: OOT posts first, as in earlier results)')
+    parser.add_argument('--sampling', type=str, default='shuffle',
+                        choices=SAMPLINGS,
+                        help="How to sample OOT posts: 'shuffle' all posts "
+                        "of the OOT thread, reproducing seeded results of "
+                        "earlier versions, or 'sample' only num_oot of "
+                        "them, which is faster but gives other samples")
+    parser.add_argument('--result-dir', type=str, default=None,
+                        help='Directory storing the result of each setting '
+                        'as soon as it is done, so an interrupted run can be '
+                        'resumed (default: HDF5 name + .parts, removed once '
+                        'the HDF5 file is stored)')
     parser.add_argument('--hdf-name', type=str, required=True,
                         help='Where to store the result in HDF5 format')
     parser.add_argument('--hdf-key', type=str, default='df',
@@ -135,9 +241,6 @@ if __name__ == '__main__':
     args = parser.parse_args()
 
     # Experiment settings
-    names = ['method', 'feature', 'max_features', 'metric', 'norm_dir',
-             'oot_dir', 'num_norm', 'num_oot', 'num_top']
-    ExprSetting = namedtuple('ExprSetting', names)
     if args.max_features is None:
         args.max_features = [None]
     settings = list(it.product(args.method, args.feature, args.max_features,
@@ -145,54 +248,91 @@ if __name__ == '__main__':
                                args.num_norm, args.num_oot, args.num_top))
     settings = [ExprSetting(*sett) for sett in settings[:]]
 
-    # Do experiments
-    results = (experiment(setting, args.niter) for setting in settings)
+    if args.feature_cache is not None:
+        feature_cache = FeatureCache(args.feature_cache)
+
+    # Settings whose results were stored by a previous run are skipped
+    result_dir = args.result_dir
+    if result_dir is None:
+        result_dir = args.hdf_name + '.parts'
+    store = ResultStore(result_dir)
+    pending = [setting for setting in settings
+               if result_key(setting, args) not in store]
+    if len(pending) < len(settings):
+        print('Resuming: {} of {} settings already done'
+              .format(len(settings) - len(pending), len(settings)),
+              file=sys.stderr)
+
+    # Read the posts of every thread once, before forking
+    for setting in pending:
+        corpus.posts(setting.norm_dir, setting.num_norm)
+        oot_posts(setting.oot_dir)
+    # Count unigrams once, before forking so that workers share the counts
+    for setting in pending:
+        if setting.feature == 'unigram':
+            corpus_counts(setting.norm_dir, setting.num_norm, setting.oot_dir)
+
+    # Do experiments, each iteration of each setting being a task
+    tasks = [(setting, iteration_seed(args.seed, setting, jj), args.ties,
+              args.sampling)
+             for setting in pending for jj in range(args.niter)]
+    if args.jobs > 1:
+        pool = Pool(args.jobs, init_worker, (corpus, feature_cache))
+        subresults = pool.imap(run_task, tasks)
+    else:
+        subresults = map(run_task, tasks)
+    subresults = progress(subresults, len(tasks))
 
-    index_tup, column_tup = [], []
-    data = np.array([])
-    for setting, result in zip(settings, results):
-        # Evaluate the result of each setting
+    # Evaluate and store the result of each setting as soon as it is done
+    for setting in pending:
+        result = list(it.islice(subresults, args.niter))
         baseline, performance, min_sup, max_sup = evaluate(result, setting)
+        store.save(result_key(setting, args), ranks=np.array(result),
+                   baseline=baseline, performance=performance,
+                   min_sup=min_sup, max_sup=max_sup)
+
+    if args.jobs > 1:
+        pool.close()
+        pool.join()
+
+    # Assemble the stored results into one table
+    index, columns = OrderedDict(), OrderedDict()
+    cells = []
+    for setting in settings:
+        res = store.load(result_key(setting, args))
+        min_sup, max_sup = int(res['min_sup']), int(res['max_sup'])
 
         # Prepare Pandas MultiIndex tuples
         norm_dir = shorten(setting.norm_dir)
-        oot_dir = shorten(setting.oot_dir)
+        oot_dir = OOT_SEP.join(shorten(dirname) for dirname
+                               in setting.oot_dir.split(OOT_SEP))
         max_features = 'all' if setting.max_features is None \
                        else setting.max_features
-        index_tup.append((setting.method, setting.feature, max_features,
-                          setting.metric, norm_dir, oot_dir))
-        for res in ['base', 'perf']:
-            for k in range(min_sup, max_sup+1):
-                column_tup.append((setting.num_norm, setting.num_oot,
-                                   setting.num_top, res, k))
-
-        # Prepare Pandas DataFrame data
-        data = np.concatenate((data, baseline))
-        data = np.concatenate((data, performance))
-
-    # Create index tuples list
-    st = set()
-    index = []
-    for idx in index_tup:
-        if idx not in st:
-            index.append(idx)
-            st.add(idx)
-    # Create column tuples list
-    st = set()
-    columns = []
-    for col in column_tup:
-        if col not in st:
-            columns.append(col)
-            st.add(col)
+        row = index.setdefault((setting.method, setting.feature,
+                                max_features, setting.metric, norm_dir,
+                                oot_dir), len(index))
+        for name, values in [('base', res['baseline']),
+                             ('perf', res['performance'])]:
+            for k, value in zip(range(min_sup, max_sup+1), values):
+                col = columns.setdefault((setting.num_norm, setting.num_oot,
+                                          setting.num_top, name, k),
+                                         len(columns))
+                cells.append((row, col, value))
+
+    # Prepare Pandas DataFrame data
+    data = np.full((len(index), len(columns)), np.nan)
+    for row, col, value in cells:
+        data[row, col] = value
 
     # Prepare to store in HDF5 format
     index_names = names[:6]
     column_names = names[6:] + ['result', 'k']
-    index = pd.MultiIndex.from_tuples(index, names=index_names)
-    columns = pd.MultiIndex.from_tuples(columns, names=column_names)
-    df = pd.DataFrame(data.reshape((len(index), len(columns))),
-                      index=index, columns=columns)
+    index = pd.MultiIndex.from_tuples(list(index), names=index_names)
+    columns = pd.MultiIndex.from_tuples(list(columns), names=column_names)
+    df = pd.DataFrame(data, index=index, columns=columns)
 
     # Store in HDF5 format
     df.to_hdf(args.hdf_name, args.hdf_key)
     print("Stored in HDF5 format with the name '{}'".format(args.hdf_key))
+    if args.result_dir is None:
+        shutil.rmtree(result_dir)
@@ -0,0 +1,75 @@
+import multiprocessing
+import os.path
+import shutil
+import tempfile
+from unittest.mock import Mock
+
+from nose.tools import assert_equal, assert_not_equal
+from numpy.testing import assert_almost_equal
+import numpy as np
+
+from otdet.cache import FeatureCache
+
+
+# Cache and its connection inherited by forked processes in test_fork
+_forked_cache = _parent_conn = None
+
+
+def _forked_features(doc):
+    conn = _forked_cache.connection
+    return _forked_cache.features('ns', [doc], lambda docs: [len(docs[0])]), \
+        conn is not _parent_conn
+
+
+class TestKey:
+    def test_default(self):
+        assert_equal(FeatureCache.key('ns', 'doc'),
+                     FeatureCache.key('ns', 'doc'))
+
+    def test_namespace(self):
+        assert_not_equal(FeatureCache.key('ns1', 'doc'),
+                         FeatureCache.key('ns2', 'doc'))
+
+
+class TestFeatures:
+    def setUp(self):
+        self.dirname = tempfile.mkdtemp()
+        self.filename = os.path.join(self.dirname, 'cache.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.dirname)
+
+    def test_compute_missing(self):
+        cache = FeatureCache(self.filename)
+        func = Mock(return_value=[1, 2])
+        assert_equal(cache.features('ns', ['a', 'b'], func), [1, 2])
+        func.assert_called_with(['a', 'b'])
+        func = Mock(return_value=[3])
+        assert_equal(cache.features('ns', ['b', 'c', 'a'], func), [2, 3, 1])
+        func.assert_called_with(['c'])
+
+    def test_duplicates(self):
+        cache = FeatureCache(self.filename)
+        func = Mock(return_value=[1])
+        assert_equal(cache.features('ns', ['a', 'a'], func), [1, 1])
+        func.assert_called_with(['a'])
+
+    def test_persistent(self):
+        FeatureCache(self.filename).features('ns', ['a'],
+                                             lambda docs: [np.arange(3)])
+        func = Mock()
+        result = FeatureCache(self.filename).features('ns', ['a'], func)
+        assert_almost_equal(result[0], np.arange(3))
+        assert_equal(func.call_count, 0)
+
+    def test_fork(self):
+        global _forked_cache, _parent_conn
+        _forked_cache = FeatureCache(self.filename)
+        _forked_cache.features('ns', ['a'], lambda docs: [1])
+        _parent_conn = _forked_cache.connection
+        ctx = multiprocessing.get_context('fork')
+        with ctx.Pool(2) as pool:
+            result = pool.map(_forked_features, ['bb', 'ccc'])
+        assert_equal(result, [([2], True), ([3], True)])
+        assert_equal(_forked_cache.features('ns', ['a', 'bb'], Mock()),
+                     [1, 2])
@@ -0,0 +1,144 @@
+import contextlib
+import json
+import os
+import tempfile
+
+from nose.tools import assert_equal, assert_true, raises
+from numpy.testing import assert_almost_equal
+import numpy as np
+
+from otdet.cli import main, make_detector, parse_max_features, rank, \
+    read_threads, score
+from otdet.detector import OOTDetector
+from otdet.feature_extraction import ReadabilityMeasures
+
+
+class TestParseMaxFeatures:
+    def test_default(self):
+        assert_equal(parse_max_features(None), None)
+        assert_equal(parse_max_features('10'), 10)
+        assert_equal(parse_max_features('0.5'), 0.5)
+
+
+class TestMakeDetector:
+    def test_unigram(self):
+        detector = make_detector(max_features=10)
+        assert_equal(detector.extractor.max_features, 10)
+        assert_true(detector.extractor.sparse)
+
+    def test_readability(self):
+        detector = make_detector('readability')
+        assert_true(isinstance(detector.extractor, ReadabilityMeasures))
+
+    @raises(Exception)
+    def test_invalid(self):
+        make_detector('foo')
+
+
+class TestReadThreads:
+    def test_threads(self):
+        lines = ['{"id": "a", "posts": ["x", "y"]}\n', '\n',
+                 '["z", "w"]\n', '{"posts": ["v"]}\n']
+        result = list(read_threads(lines))
+        assert_equal(result, [('a', ['x', 'y']), (3, ['z', 'w']),
+                              (4, ['v'])])
+
+    def test_posts(self):
+        lines = ['{"thread": 1, "text": "x"}', '{"thread": 1, "text": "y"}',
+                 '{"thread": 2, "text": "z"}', '["w"]',
+                 '{"thread": 1, "text": "v"}']
+        result = list(read_threads(lines))
+        assert_equal(result, [(1, ['x', 'y']), (2, ['z']), (4, ['w']),
+                              (1, ['v'])])
+
+    def test_lazy(self):
+        def lines():
+            yield '["x"]'
+            yield '["y"]'
+            raise Exception('read too far')
+        assert_equal(next(read_threads(lines())), (1, ['x']))
+
+
+class TestRank:
+    def test_default(self):
+        result = rank([0.5, 2., np.nan, 2., 1.])
+        assert_equal(list(result), [1, 3, 4, 0, 2])
+
+    def test_top(self):
+        result = rank([0.5, 2., np.nan, 2., 1.], top=2)
+        assert_equal(list(result), [1, 3])
+
+
+class TestScore:
+    def setUp(self):
+        self.threads = [('a', ['foo bar bar baz', 'foo bar', 'baz baz qux']),
+                        ('b', ['qux foo quux', 'quux quux'])]
+
+    def test_default(self):
+        detector = OOTDetector()
+        result = list(score(iter(self.threads), detector, batch_size=1))
+        assert_equal([res['id'] for res in result], ['a', 'b'])
+        for (_, posts), res in zip(self.threads, result):
+            expected = detector.clust_dist(posts)
+            posts = [r['post'] for r in res['ranking']]
+            scores = [r['score'] for r in res['ranking']]
+            assert_equal(posts, list(rank(expected)))
+            assert_almost_equal(scores, expected[posts])
+
+    def test_error(self):
+        threads = [self.threads[0], ('c', ['the', 'and the']),
+                   self.threads[1]]
+        # The same whether the thread is scored alone or in a mixed batch
+        for batch_size in [1, 3]:
+            result = list(score(threads, make_detector(),
+                                batch_size=batch_size))
+            assert_equal([res['id'] for res in result], ['a', 'c', 'b'])
+            assert_true('vocabulary' in result[1]['error'])
+            assert_equal(len(result[0]['ranking']), 3)
+            assert_equal(len(result[2]['ranking']), 2)
+
+    def test_error_batch(self):
+        threads = [('c', ['the', 'and the']), ('d', ['a', 'an'])]
+        result = list(score(threads, make_detector()))
+        assert_equal([res['id'] for res in result], ['c', 'd'])
+        assert_true(all('error' in res for res in result))
+
+    def test_top(self):
+        result = list(score(self.threads, OOTDetector(), top=1))
+        assert_equal([len(res['ranking']) for res in result], [1, 1])
+
+
+class TestMain:
+    def setUp(self):
+        self.dirname = tempfile.mkdtemp()
+        self.input = os.path.join(self.dirname, 'in.jsonl')
+        self.output = os.path.join(self.dirname, 'out.jsonl')
+        with open(self.input, 'w') as f:
+            f.write('{"id": "a", "posts": ["foo bar", "foo bar baz", '
+                    '"qux quux"]}\n')
+            f.write('["foo bar", "bar qux"]\n')
+
+    def tearDown(self):
+        for filename in [self.input, self.output]:
+            if os.path.exists(filename):
+                os.remove(filename)
+        os.rmdir(self.dirname)
+
+    def test_score(self):
+        main(['score', '-i', self.input, '-o', self.output, '-d', 'cosine',
+              '-t', '1'])
+        with open(self.output) as f:
+            result = [json.loads(line) for line in f]
+        assert_equal([res['id'] for res in result], ['a', 2])
+        assert_equal(result[0]['ranking'][0]['post'], 2)
+
+    def test_fraction_max_features(self):
+        main(['score', '-i', self.input, '-o', self.output,
+              '--max-features', '0.5'])
+        with open(self.output) as f:
+            result = [json.loads(line) for line in f]
+        assert_equal([len(res['ranking']) for res in result], [3, 2])
+
+    def test_no_command(self):
+        with open(os.devnull, 'w') as f, contextlib.redirect_stdout(f):
+            assert_equal(main([]), 2)
@@ -0,0 +1,53 @@
+import os.path
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from nose.tools import assert_equal, assert_true, raises
+
+from otdet.corpus import Corpus
+
+
+class TestCorpus:
+    def setUp(self):
+        self.dirname = tempfile.mkdtemp()
+        for i in [2, 0, 10, 1]:
+            filename = os.path.join(self.dirname, 'post-{}.txt'.format(i))
+            with open(filename, 'w') as f:
+                f.write('post {}\n'.format(i))
+
+    def tearDown(self):
+        shutil.rmtree(self.dirname)
+
+    def test_load(self):
+        corpus = Corpus()
+        expected = ('post 0\n', 'post 1\n', 'post 2\n', 'post 10\n')
+        assert_equal(corpus.load(self.dirname), expected)
+        assert_true(self.dirname in corpus)
+        assert_equal(len(corpus), 1)
+
+    def test_read_once(self):
+        corpus = Corpus()
+        corpus.load(self.dirname)
+        with patch('otdet.corpus.open', create=True) as mock_open:
+            corpus.load(self.dirname + os.sep)
+            corpus.posts(self.dirname, k=2)
+            assert_equal(mock_open.call_count, 0)
+
+    def test_posts(self):
+        corpus = Corpus()
+        assert_equal(corpus.posts(self.dirname, k=2), ('post 0\n', 'post 1\n'))
+        assert_equal(len(corpus.posts(self.dirname)), 4)
+
+    def test_read_lazily(self):
+        corpus = Corpus()
+        with patch('otdet.corpus.open', create=True, wraps=open) as mock_open:
+            assert_equal(corpus.posts(self.dirname, k=2),
+                         ('post 0\n', 'post 1\n'))
+            assert_equal(mock_open.call_count, 2)
+            assert_equal(len(corpus.posts(self.dirname, k=3)), 3)
+            assert_equal(mock_open.call_count, 3)
+
+    @raises(Exception)
+    def test_negative_k(self):
+        Corpus().posts(self.dirname, k=-1)
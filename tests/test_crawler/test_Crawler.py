@@ -0,0 +1,214 @@
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import os
+import shutil
+from socketserver import ThreadingMixIn
+import tempfile
+import threading
+import time
+
+from nose.tools import assert_equal, assert_raises, assert_true
+
+from otdet.crawler import Crawler, Job, save_posts
+from otdet.journal import CrawlJournal
+from otdet.sites import PhysicsForums, XenForoSite
+
+
+def texts(posts):
+    return [post.text for post in posts]
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    """Serve pages of two posts with ETags, failing on some requests."""
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append((self.path, time.monotonic()))
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+            fail = server.failures.get(self.path, 0)
+            if fail:
+                server.failures[self.path] = fail - 1
+            num_posts = server.num_posts.get(self.path, 2)
+        time.sleep(0.02)
+        etag = '"{}"'.format(num_posts)
+        if fail:
+            self.send_response(503)
+            body = b''
+        elif self.path.endswith('/page-9'):
+            self.send_response(404)
+            body = b''
+        elif self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            body = b''
+        else:
+            self.send_response(200)
+            self.send_header('ETag', etag)
+            body = ''.join('<blockquote class="messageText">{} {}'
+                           '</blockquote>'.format(self.path, i)
+                           for i in range(num_posts)).encode('utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        with server.lock:
+            server.active -= 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FixtureServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super(FixtureServer, self).__init__(('127.0.0.1', 0), FixtureHandler)
+        self.lock = threading.Lock()
+        self.requests = []
+        self.failures = {}
+        self.num_posts = {}
+        self.active = self.max_active = 0
+
+
+class TestCrawler:
+    def setUp(self):
+        self.server = FixtureServer()
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+        url = 'http://127.0.0.1:{}'.format(self.server.server_port)
+        self.site = XenForoSite(url)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def test_default(self):
+        jobs = [Job(self.site, 'a', [1, 2]), Job(self.site, 'b', [1])]
+        result = Crawler().run(jobs)
+        expected = [['/threads/a/page-{} {}\n'.format(page, i)
+                     for page in [1, 2] for i in range(2)],
+                    ['/threads/b/page-1 {}\n'.format(i) for i in range(2)]]
+        assert_equal([texts(posts) for posts in result], expected)
+        assert_equal([post.number for post in result[0]], [0, 1, 2, 3])
+
+    def test_callback(self):
+        done = []
+        jobs = [Job(self.site, 'a', [1]), Job(self.site, 'b', [1])]
+        Crawler().run(jobs, callback=lambda job, posts: done.append(job))
+        assert_equal(sorted(job.thread_id for job in done), ['a', 'b'])
+
+    def test_concurrency(self):
+        jobs = [Job(self.site, str(i), [1, 2, 3]) for i in range(4)]
+        Crawler(concurrency=3).run(jobs)
+        assert_equal(len(self.server.requests), 12)
+        assert_true(1 < self.server.max_active <= 3)
+
+    def test_rate(self):
+        jobs = [Job(self.site, 'a', [1, 2, 3, 4])]
+        Crawler(rate=20).run(jobs)
+        times = sorted(t for _, t in self.server.requests)
+        assert_true(times[-1] - times[0] >= 3 * 0.05 * 0.9)
+
+    def test_retry(self):
+        self.server.failures['/threads/a/page-1'] = 2
+        result = Crawler(backoff=0.01).run([Job(self.site, 'a', [1])])
+        assert_equal(len(result[0]), 2)
+        assert_equal(len(self.server.requests), 3)
+
+    def test_give_up(self):
+        self.server.failures['/threads/a/page-1'] = 5
+        result = Crawler(retries=1, backoff=0.01).run(
+            [Job(self.site, 'a', [1, 2])])
+        assert_equal(texts(result[0]), ['/threads/a/page-2 0\n',
+                                        '/threads/a/page-2 1\n'])
+
+    def test_not_found(self):
+        result = Crawler().run([Job(self.site, 'a', [9])])
+        assert_equal(result, [[]])
+        assert_equal(len(self.server.requests), 1)
+
+
+class TestCrawlerJournal:
+    def setUp(self):
+        self.server = FixtureServer()
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+        url = 'http://127.0.0.1:{}'.format(self.server.server_port)
+        self.site = PhysicsForums(url)
+        self.dirname = tempfile.mkdtemp()
+        self.journal = CrawlJournal(os.path.join(self.dirname, 'journal.db'))
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        shutil.rmtree(self.dirname)
+
+    def crawl(self, pages, **kwargs):
+        self.server.requests = []
+        crawler = Crawler(journal=self.journal, **kwargs)
+        return crawler.run([Job(self.site, 'a', pages)])[0]
+
+    def test_first_crawl(self):
+        posts = self.crawl([1, 2])
+        assert_equal([post.number for post in posts], [0, 1, 2, 3])
+        assert_equal(self.journal.last_page('physicsforums/a'), 2)
+
+    def test_unchanged(self):
+        self.crawl([1, 2])
+        posts = self.crawl([1, 2])
+        assert_equal(posts, [])
+        # Only the last page is requested, and it is not modified
+        assert_equal([path for path, _ in self.server.requests],
+                     ['/threads/a/page-2'])
+
+    def test_revalidate(self):
+        self.crawl([1, 2])
+        posts = self.crawl([1, 2], revalidate=True)
+        assert_equal(posts, [])
+        assert_equal(len(self.server.requests), 2)
+
+    def test_new_posts(self):
+        self.crawl([1, 2])
+        self.server.num_posts['/threads/a/page-2'] = 3
+        posts = self.crawl([1, 2, 3])
+        assert_equal(posts, [(4, '/threads/a/page-2 2\n'),
+                             (5, '/threads/a/page-3 0\n'),
+                             (6, '/threads/a/page-3 1\n')])
+        assert_equal(self.crawl([1, 2, 3]), [])
+
+    def test_failed_page(self):
+        self.server.failures['/threads/a/page-2'] = 5
+        posts = self.crawl([1, 2], retries=1, backoff=0.01)
+        assert_equal(len(posts), 2)
+        posts = self.crawl([1, 2])
+        assert_equal(texts(posts), ['/threads/a/page-2 0\n',
+                                    '/threads/a/page-2 1\n'])
+        assert_equal([post.number for post in posts], [2, 3])
+
+    def test_callback_fails(self):
+        def fail(job, posts):
+            raise IOError('disk full')
+
+        crawler = Crawler(journal=self.journal)
+        assert_raises(IOError, crawler.run, [Job(self.site, 'a', [1])],
+                      callback=fail)
+        # Nothing is committed, so the posts are saved again next time
+        posts = self.crawl([1])
+        assert_equal([post.number for post in posts], [0, 1])
+
+
+class TestSavePosts:
+    def setUp(self):
+        self.dirname = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dirname)
+
+    def test_default(self):
+        savedir = os.path.join(self.dirname, 'thread')
+        save_posts(['a\n', 'b\n'], savedir, start=3)
+        assert_equal(sorted(os.listdir(savedir)),
+                     ['post-3.txt', 'post-4.txt'])
+        with open(os.path.join(savedir, 'post-4.txt')) as f:
+            assert_equal(f.read(), 'b\n')
@@ -0,0 +1,55 @@
+from nose.tools import assert_equal, assert_raises
+from numpy.testing import assert_almost_equal
+import numpy as np
+
+from otdet.detector import IncrementalOOTDetector, OOTDetector
+
+
+documents = ['the cat sat on a mat', 'a cat and a dog',
+             'dogs chase cats all day', 'stock prices fell sharply today',
+             'the cat chased the dog']
+
+
+class TestInit:
+    def test_invalid_metric(self):
+        assert_raises(Exception, IncrementalOOTDetector, metric='foo')
+
+
+class TestAdd:
+    def test_default(self):
+        detector = IncrementalOOTDetector()
+        assert_equal(detector.add(documents[0]), 0)
+        assert_equal(detector.add(documents[1]), 1)
+        assert_equal(len(detector), 2)
+
+    def test_design_matrix(self):
+        detector = IncrementalOOTDetector()
+        detector.extend(documents)
+        expected = OOTDetector().design_matrix(documents)
+        # Columns are ordered by first occurrence instead of alphabetically
+        result = detector.X.toarray()
+        assert_equal(result.shape, expected.shape)
+        assert_almost_equal(np.sort(result, axis=1),
+                            np.sort(expected, axis=1))
+
+
+class TestScores:
+    def check(self, method, metric):
+        detector = IncrementalOOTDetector(metric=metric)
+        for k in range(2, len(documents)+1):
+            detector.extend(documents[len(detector):k])
+            expected = getattr(OOTDetector(), method)(documents[:k], metric)
+            result = getattr(detector, method)()
+            assert_almost_equal(result, expected)
+
+    def test_clust_dist(self):
+        for metric in ['euclidean', 'cityblock', 'cosine', 'correlation']:
+            yield self.check, 'clust_dist', metric
+
+    def test_mean_comp(self):
+        for metric in ['euclidean', 'cityblock', 'cosine', 'correlation']:
+            yield self.check, 'mean_comp', metric
+
+    def test_txt_comp_dist(self):
+        for metric in ['euclidean', 'cityblock', 'cosine', 'correlation']:
+            yield self.check, 'txt_comp_dist', metric
@@ -1,6 +1,7 @@
-from nose.tools import assert_true
+from nose.tools import assert_equal, assert_true, raises
 from numpy.testing import assert_almost_equal
 import numpy as np
+import scipy.sparse as sp
 from unittest.mock import call, patch
 
 from otdet.detector import OOTDetector
@@ -18,6 +19,10 @@ class TestInit:
         detector = OOTDetector(extractor=ReadabilityMeasures())
         assert_true(isinstance(detector.extractor, ReadabilityMeasures))
 
+    def test_sparse(self):
+        detector = OOTDetector(sparse=True)
+        assert_true(detector.extractor.sparse)
+
 
 class TestDesignMatrix:
     @patch.object(CountVectorizerWrapper, 'fit_transform')
@@ -30,6 +35,14 @@ class TestDesignMatrix:
         assert_almost_equal(result, expected)
         mock_fit_transform.assert_called_with(documents)
 
+    @patch.object(CountVectorizerWrapper, 'fit_transform')
+    def test_cache(self, mock_fit_transform):
+        cache = object()
+        detector = OOTDetector(cache=cache)
+        documents = ['a b c. c b.', 'b c. a a c.']
+        detector.design_matrix(documents)
+        mock_fit_transform.assert_called_with(documents, cache=cache)
+
 
 @patch.object(OOTDetector, 'design_matrix')
 class TestClustDist:
@@ -54,6 +67,14 @@ class TestClustDist:
         assert_almost_equal(result, expected)
         mock_design_matrix.assert_called_with(self.documents)
 
+    def test_sparse(self, mock_design_matrix):
+        X = sp.csr_matrix([[2, 1, 0], [-1, 3, 4], [2, -2, 1]])
+        mock_design_matrix.return_value = X
+        expected = np.array([13/3, 20/3, 5])
+        result = self.detector.clust_dist(self.documents,
+                                          metric='cityblock')
+        assert_almost_equal(result, expected)
+
 
 @patch.object(OOTDetector, 'design_matrix')
 class TestMeanComp:
@@ -78,7 +99,16 @@ class TestMeanComp:
         assert_almost_equal(result, expected)
         mock_design_matrix.assert_called_with(self.documents)
 
+    def test_sparse(self, mock_design_matrix):
+        X = sp.csr_matrix([[2, 1, 0], [-1, 3, 4], [2, -2, 1]])
+        mock_design_matrix.return_value = X
+        expected = np.array([9/2, 10, 13/2])
+        result = self.detector.mean_comp(self.documents,
+                                         metric='cityblock')
+        assert_almost_equal(result, expected)
 
+
+@patch.object(CountVectorizerWrapper, 'is_additive', False)
 @patch.object(CountVectorizerWrapper, 'fit')
 @patch.object(CountVectorizerWrapper, 'transform')
 class TestTxtCompDist:
@@ -108,3 +138,99 @@ class TestTxtCompDist:
         expected = np.sqrt(np.array([3, 5, 5]))
         result = self.detector.txt_comp_dist(self.documents)
         assert_almost_equal(result, expected)
+
+    def test_sparse(self, mock_transform, mock_fit):
+        mock_transform.side_effect = [
+            sp.csr_matrix([1, 2, 3]), sp.csr_matrix([2, 1, 4]),
+            sp.csr_matrix([1, 0, 2]), sp.csr_matrix([3, 1, 2]),
+            sp.csr_matrix([1, 1, 2]), sp.csr_matrix([1, 2, 4])
+        ]
+        expected = np.sqrt(np.array([3, 5, 5]))
+        result = self.detector.txt_comp_dist(self.documents)
+        assert_almost_equal(result, expected)
+
+
+class TestTxtCompDistAdditive:
+    def setUp(self):
+        self.documents = ['foo bar bar baz\n', 'foo bar\n', 'baz baz.\n',
+                          'qux foo quux\n']
+
+    def test_default(self):
+        for metric in ['euclidean', 'cityblock', 'cosine', 'correlation']:
+            detector = OOTDetector()
+            assert_true(detector.extractor.is_additive)
+            with patch.object(CountVectorizerWrapper, 'is_additive', False):
+                expected = detector.txt_comp_dist(self.documents, metric)
+            result = detector.txt_comp_dist(self.documents, metric)
+            assert_almost_equal(result, expected)
+
+    def test_sparse(self):
+        detector = OOTDetector()
+        expected = detector.txt_comp_dist(self.documents, 'cosine')
+        detector = OOTDetector(sparse=True)
+        result = detector.txt_comp_dist(self.documents, 'cosine')
+        assert_almost_equal(result, expected)
+
+    def test_not_additive(self):
+        extractor = CountVectorizerWrapper(input='content',
+                                           ngram_range=(1, 2))
+        detector = OOTDetector(extractor=extractor)
+        assert_true(not detector.extractor.is_additive)
+
+
+class TestScoreThreads:
+    def setUp(self):
+        self.threads = [['foo bar bar baz\n', 'foo bar\n', 'baz baz.\n'],
+                        ['qux foo quux\n', 'quux quux\n'],
+                        ['bar baz\n', 'qux qux baz\n', 'foo\n', 'bar foo\n']]
+
+    def check(self, detector, method, metric):
+        expected = [getattr(detector, method)(thread, metric)
+                    for thread in self.threads]
+        result = detector.score_threads(self.threads, method, metric)
+        assert_equal(len(result), len(expected))
+        for res, exp in zip(result, expected):
+            assert_almost_equal(res, exp)
+
+    def test_default(self):
+        for method in OOTDetector.METHODS:
+            for metric in ['euclidean', 'cityblock', 'cosine',
+                           'correlation']:
+                yield self.check, OOTDetector(), method, metric
+
+    def test_offsets(self):
+        detector = OOTDetector()
+        documents = [doc for thread in self.threads for doc in thread]
+        expected = np.concatenate(detector.score_threads(self.threads))
+        result = detector.score_threads(documents, offsets=[0, 3, 5, 9])
+        assert_almost_equal(result, expected)
+
+    def test_empty(self):
+        detector = OOTDetector()
+        assert_equal(detector.score_threads([]), [])
+        assert_equal(len(detector.score_threads([], offsets=[0])), 0)
+
+    @raises(ValueError)
+    def test_no_features(self):
+        OOTDetector().score_threads(self.threads + [['the', 'and the']])
+
+    def test_large_thread(self):
+        detector = OOTDetector(max_memory=8*40)
+        expected = detector.clust_dist(self.threads[2] * 10)
+        result = detector.score_threads([self.threads[2] * 10])
+        assert_almost_equal(result[0], expected)
+
+    @patch.object(OOTDetector, 'clust_dist')
+    def test_batched(self, mock_clust_dist):
+        OOTDetector().score_threads(self.threads)
+        assert_true(not mock_clust_dist.called)
+
+    def test_not_separable(self):
+        extractor = CountVectorizerWrapper(input='content', max_features=2)
+        assert_true(not extractor.is_separable)
+        yield self.check, OOTDetector(extractor=extractor), 'clust_dist', \
+            'euclidean'
+
+    @raises(Exception)
+    def test_invalid_method(self):
+        OOTDetector().score_threads(self.threads, method='foo')
@@ -0,0 +1,284 @@
+import tracemalloc
+
+from nose.tools import assert_true, raises
+from numpy.testing import assert_almost_equal
+import numpy as np
+import scipy.sparse as sp
+import scipy.spatial.distance as dist
+
+from otdet import distance
+
+
+class TestCdist:
+    def setUp(self):
+        self.XA = np.array([[2, 1, 0, 0], [-1, 3, 4, 0], [0, 0, 1, 5]])
+        self.XB = np.array([[1, 0, 0, 2], [0, 2, 2, 1]])
+
+    def test_dense(self):
+        for metric in distance.METRICS:
+            expected = dist.cdist(self.XA, self.XB, metric)
+            result = distance.cdist(self.XA, self.XB, metric)
+            assert_almost_equal(result, expected)
+
+    def test_sparse(self):
+        XA, XB = sp.csr_matrix(self.XA), sp.csr_matrix(self.XB)
+        for metric in distance.METRICS:
+            expected = dist.cdist(self.XA, self.XB, metric)
+            result = distance.cdist(XA, XB, metric)
+            assert_almost_equal(result, expected)
+
+    def test_mixed(self):
+        XA = sp.csr_matrix(self.XA)
+        for metric in distance.METRICS:
+            expected = dist.cdist(self.XA, self.XB, metric)
+            result = distance.cdist(XA, self.XB, metric)
+            assert_almost_equal(result, expected)
+
+    @raises(Exception)
+    def test_unknown_sparse_metric(self):
+        XA, XB = sp.csr_matrix(self.XA), sp.csr_matrix(self.XB)
+        distance.cdist(XA, XB, 'chebyshev')
+
+
+class TestPairwise:
+    def setUp(self):
+        self.X = np.array([[2, 1, 0], [-1, 3, 4], [2, -2, 1]])
+
+    def test_dense(self):
+        expected = dist.squareform(dist.pdist(self.X, 'cityblock'))
+        result = distance.pairwise(self.X, 'cityblock')
+        assert_almost_equal(result, expected)
+
+    def test_sparse(self):
+        X = sp.csr_matrix(self.X)
+        for metric in distance.METRICS:
+            expected = dist.squareform(dist.pdist(self.X, metric))
+            result = distance.pairwise(X, metric)
+            assert_almost_equal(result, expected)
+            assert_almost_equal(np.diag(result), np.zeros(3))
+
+
+class TestBetween:
+    def test_sparse(self):
+        u, v = np.array([1, 0, 0, 3]), np.array([0.5, 2, 0, 1])
+        for metric in distance.METRICS:
+            expected = getattr(dist, metric)(u, v)
+            result = distance.between(sp.csr_matrix(u), v[np.newaxis, :],
+                                      metric)
+            assert_almost_equal(result, expected)
+
+
+class TestMeanPairwise:
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.X = rng.poisson(0.5, size=(23, 7))
+
+    def test_dense(self):
+        for metric in distance.METRICS:
+            expected = np.mean(dist.squareform(dist.pdist(self.X, metric)),
+                               axis=0)
+            result = distance.mean_pairwise(self.X, metric)
+            assert_almost_equal(result, expected)
+
+    def test_blocks(self):
+        expected = np.mean(dist.squareform(dist.pdist(self.X)), axis=0)
+        for max_memory in [1, 8*23*4, 8*23*22]:
+            result = distance.mean_pairwise(self.X, max_memory=max_memory)
+            assert_almost_equal(result, expected)
+
+    def test_sparse(self):
+        X = sp.csr_matrix(self.X)
+        for metric in distance.METRICS:
+            expected = np.mean(dist.squareform(dist.pdist(self.X, metric)),
+                               axis=0)
+            result = distance.mean_pairwise(X, metric, max_memory=8*23*5)
+            assert_almost_equal(result, expected)
+
+    def test_memory(self):
+        X = sp.random(1000, 50, density=0.1, format='csr', random_state=0)
+        max_memory = 8*1000*100
+        for metric in distance.METRICS:
+            tracemalloc.start()
+            try:
+                distance.mean_pairwise(X, metric, max_memory=max_memory)
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+            assert_true(peak < 1.2*max_memory)
+
+    def test_jobs(self):
+        expected = np.mean(dist.squareform(dist.pdist(self.X, 'cosine')),
+                           axis=0)
+        result = distance.mean_pairwise(self.X, 'cosine', max_memory=8*23*5,
+                                        n_jobs=2)
+        assert_almost_equal(result, expected)
+
+
+class TestFromGram:
+    def setUp(self):
+        self.XA = np.array([[2, 1, 0, 0], [-1, 3, 4, 0]], dtype=float)
+        self.XB = np.array([[0, 0, 1, 5], [1, 1, 1, 1], [3, 0, 0, 2]],
+                           dtype=float)
+
+    def test_default(self):
+        XA, XB = self.XA, self.XB
+        for metric in ['euclidean', 'cosine', 'correlation']:
+            expected = dist.cdist(XA, XB, metric)
+            result = distance.from_gram(np.dot(XA, XB.T),
+                                        np.sum(XA**2, axis=1),
+                                        np.sum(XB**2, axis=1),
+                                        np.sum(XA, axis=1),
+                                        np.sum(XB, axis=1), 4, metric)
+            assert_almost_equal(result, expected)
+
+    @raises(Exception)
+    def test_cityblock(self):
+        distance.from_gram(np.zeros((1, 1)), np.zeros(1), np.zeros(1),
+                           np.zeros(1), np.zeros(1), 1, 'cityblock')
+
+
+class TestPaired:
+    def test_default(self):
+        XA = np.array([[2, 1, 0], [-1, 3, 4]])
+        XB = np.array([[1, 1, 1], [0, 2, -2]])
+        for metric in distance.METRICS:
+            expected = [getattr(dist, metric)(u, v) for u, v in zip(XA, XB)]
+            result = distance.paired(XA, XB, metric)
+            assert_almost_equal(result, expected)
+
+
+class TestComplement:
+    def setUp(self):
+        self.X = np.array([[2, 1, 0, 0], [-1, 3, 4, 0], [0, 0, 1, 5],
+                           [1, 0, 0, 0]])
+
+    def leave_one_out(self, metric, mean):
+        res = []
+        for i in range(len(self.X)):
+            comp = np.delete(self.X, i, axis=0)
+            v = np.mean(comp, axis=0) if mean else np.sum(comp, axis=0)
+            res.append(getattr(dist, metric)(self.X[i], v))
+        return np.array(res)
+
+    def test_dense(self):
+        for metric in distance.METRICS:
+            for mean in [True, False]:
+                expected = self.leave_one_out(metric, mean)
+                result = distance.complement(self.X, metric, mean=mean)
+                assert_almost_equal(result, expected)
+
+    def test_sparse(self):
+        X = sp.csr_matrix(self.X)
+        for metric in distance.METRICS:
+            for mean in [True, False]:
+                expected = self.leave_one_out(metric, mean)
+                result = distance.complement(X, metric, mean=mean)
+                assert_almost_equal(result, expected)
+
+
+class TestComplementFromMoments:
+    def test_default(self):
+        X = np.array([[2, 1, 0, 0], [-1, 3, 4, 0], [0, 0, 1, 5]], dtype=float)
+        S = np.sum(X, axis=0)
+        for metric in ['euclidean', 'cosine', 'correlation']:
+            for scale in [1, 0.5]:
+                expected = distance.paired(X, (S - X)*scale, metric)
+                result = distance.complement_from_moments(
+                    np.sum(X**2, axis=1), np.dot(X, S), np.sum(X, axis=1),
+                    np.dot(S, S), np.sum(S), 4, scale, metric)
+                assert_almost_equal(result, expected)
+
+
+class TestBlockDiagonal:
+    def test_default(self):
+        X = sp.csr_matrix([[1, 0, 2], [0, 3, 0], [4, 0, 0], [0, 0, 5]])
+        result, col_seg = distance.block_diagonal(X, [0, 2, 4])
+        expected = [[1, 0, 2, 0, 0], [0, 3, 0, 0, 0], [0, 0, 0, 4, 0],
+                    [0, 0, 0, 0, 5]]
+        assert_almost_equal(result.toarray(), expected)
+        assert_almost_equal(col_seg, [0, 0, 0, 1, 1])
+
+
+class TestSegmented:
+    def setUp(self):
+        self.X = np.array([[2, 1, 0, 0], [-1, 3, 4, 0], [0, 0, 1, 5],
+                           [1, 0, 0, 0], [0, 2, 0, 1], [3, 3, 0, 0]])
+        self.offsets = [0, 3, 3, 5, 6]
+        self.dims = [6, 5, 4, 7]
+
+    def expected(self, func, metric, **kwargs):
+        res = []
+        for a, b in zip(self.offsets[:-1], self.offsets[1:]):
+            res.extend(func(self.X[a:b], metric, **kwargs))
+        return np.array(res)
+
+    def test_mean_pairwise(self):
+        X = sp.csr_matrix(self.X)
+        for metric in distance.METRICS:
+            expected = self.expected(distance.mean_pairwise, metric)
+            for max_memory in [None, 8]:
+                result = distance.segmented_mean_pairwise(
+                    X, self.offsets, metric, max_memory=max_memory)
+                assert_almost_equal(result, expected)
+
+    def test_mean_pairwise_jobs(self):
+        expected = self.expected(distance.mean_pairwise, 'cosine')
+        result = distance.segmented_mean_pairwise(
+            self.X, self.offsets, 'cosine', max_memory=8, n_jobs=2)
+        assert_almost_equal(result, expected)
+
+    def test_complement(self):
+        for metric in distance.METRICS:
+            for mean in [True, False]:
+                expected = self.expected(distance.complement, metric,
+                                         mean=mean)
+                result = distance.segmented_complement(
+                    self.X, self.offsets, metric, mean=mean)
+                assert_almost_equal(result, expected)
+
+    def test_dims(self):
+        X = sp.csr_matrix(self.X)
+        pairwise = distance.segmented_mean_pairwise(
+            X, self.offsets, 'correlation', dims=self.dims)
+        comp = distance.segmented_complement(
+            X, self.offsets, 'correlation', dims=self.dims)
+        for t, (a, b) in enumerate(zip(self.offsets[:-1], self.offsets[1:])):
+            # Correlation with d columns, the rest being zeros
+            Y = np.hstack((self.X[a:b], np.zeros((b-a, self.dims[t]-4))))
+            assert_almost_equal(pairwise[a:b],
+                                distance.mean_pairwise(Y, 'correlation'))
+            assert_almost_equal(comp[a:b],
+                                distance.complement(Y, 'correlation'))
+
+    def test_dims_blocks(self):
+        X = sp.csr_matrix(self.X)
+        expected = distance.segmented_mean_pairwise(
+            X, self.offsets, 'correlation', dims=self.dims)
+        result = distance.segmented_mean_pairwise(
+            X, self.offsets, 'correlation', dims=self.dims, max_memory=8)
+        assert_almost_equal(result, expected)
+
+    def test_memory(self):
+        X = sp.random(1000, 50, density=0.1, format='csr', random_state=0)
+        max_memory = 8*1000*100
+        for metric in distance.METRICS:
+            tracemalloc.start()
+            try:
+                result = distance.segmented_mean_pairwise(
+                    X, [0, 1000], metric, max_memory=max_memory)
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+            assert_true(peak < 1.2*max_memory)
+            assert_almost_equal(result, distance.mean_pairwise(X, metric))
+
+    def test_nonzero_dims(self):
+        X = sp.csr_matrix(self.X)
+        for func in [distance.segmented_mean_pairwise,
+                     distance.segmented_complement]:
+            result = func(X, self.offsets, 'correlation', dims='nonzero')
+            for a, b in zip(self.offsets[:-1], self.offsets[1:]):
+                # Correlation over the nonzero columns of the segment only
+                Y = self.X[a:b][:, self.X[a:b].any(axis=0)]
+                expected = func(Y, [0, b-a], 'correlation')
+                assert_almost_equal(result[a:b], expected)
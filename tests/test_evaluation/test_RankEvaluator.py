@@ -0,0 +1,62 @@
+from nose.tools import assert_equal
+from numpy.testing import assert_almost_equal
+import numpy as np
+from sklearn.metrics import average_precision_score, roc_auc_score
+
+from otdet.evaluation import RankEvaluator
+
+
+class TestFromScores:
+    def test_default(self):
+        scores = np.array([[0.1, 0.9, 0.5], [0.7, 0.2, 0.7]])
+        is_oot = np.array([[False, True, False], [True, False, False]])
+        evaluator = RankEvaluator.from_scores(scores, is_oot)
+        expected = [[True, False, False], [False, True, False]]
+        assert_equal(evaluator.labels.tolist(), expected)
+
+    def test_best(self):
+        scores = np.array([[0.7, 0.2, 0.7]])
+        is_oot = np.array([[False, False, True]])
+        evaluator = RankEvaluator.from_scores(scores, is_oot, ties='best')
+        assert_equal(evaluator.labels.tolist(), [[True, False, False]])
+
+
+class TestMetrics:
+    def setUp(self):
+        self.result = [
+            [(5, True), (4, False), (3, True), (2, False), (1, False)],
+            [(5, False), (4, False), (3, False), (2, True), (1, True)]
+        ]
+        self.evaluator = RankEvaluator(self.result)
+
+    def test_precision_recall(self):
+        assert_almost_equal(self.evaluator.precision,
+                            [[1, 1/2, 2/3, 2/4, 2/5], [0, 0, 0, 1/4, 2/5]])
+        assert_almost_equal(self.evaluator.recall,
+                            [[0.5, 0.5, 1, 1, 1], [0, 0, 0, 0.5, 1]])
+
+    def test_average_precision(self):
+        assert_almost_equal(self.evaluator.average_precision,
+                            [(1 + 2/3) / 2, (1/4 + 2/5) / 2])
+
+    def test_reciprocal_rank(self):
+        assert_almost_equal(self.evaluator.reciprocal_rank, [1, 1/4])
+
+    def test_roc_auc(self):
+        assert_almost_equal(self.evaluator.roc_auc, [5/6, 0])
+
+    def test_no_oot(self):
+        evaluator = RankEvaluator(np.zeros((1, 3), dtype=bool))
+        assert_almost_equal(evaluator.reciprocal_rank, [0])
+        assert_equal(np.isnan(evaluator.average_precision).tolist(), [True])
+
+    def test_random(self):
+        rng = np.random.RandomState(0)
+        scores = rng.rand(20, 30)
+        is_oot = rng.rand(20, 30) < 0.2
+        evaluator = RankEvaluator.from_scores(scores, is_oot)
+        for i in range(20):
+            assert_almost_equal(evaluator.average_precision[i],
+                                average_precision_score(is_oot[i], scores[i]))
+            assert_almost_equal(evaluator.roc_auc[i],
+                                roc_auc_score(is_oot[i], scores[i]))
@@ -64,6 +64,16 @@ class TestGetNums:
         ]
         TopListEvaluator(sample_result)
 
+    def test_array(self):
+        labels = np.array([[True, False, True, False, False],
+                           [False, True, False, True, False]])
+        evaluator = TopListEvaluator(labels)
+        assert_equal(evaluator._get_nums(), (5, 2))
+
+    @raises(Exception)
+    def test_array_dims(self):
+        TopListEvaluator(np.array([True, False]))
+
 
 class TestMinSup:
     def setUp(self):
@@ -139,3 +149,31 @@ class TestPerformance:
     def test_no_subresult(self):
         evaluator = TopListEvaluator([])
         evaluator.performance
+
+    def test_array(self):
+        labels = np.array([[True, False, False, True, False],
+                           [True, False, True, False, False],
+                           [False, True, True, False, False],
+                           [False, False, False, True, True]])
+        evaluator = TopListEvaluator(labels, N=3)
+        assert_equal((evaluator.M, evaluator.n), (5, 2))
+        assert_almost_equal(evaluator.performance, self.evaluator.performance)
+
+    def test_top_many_list(self):
+        self.evaluator.N = 4
+        expected = np.array([0.25, 0.75])  # 1 <= k <= 2
+        assert_almost_equal(self.evaluator.performance, expected)
+
+
+class TestPerformanceTable:
+    def test_default(self):
+        labels = np.array([[True, False, True], [False, True, True]])
+        evaluator = TopListEvaluator(labels)
+        expected = np.array([[1, 0, 0, 0], [0.5, 0.5, 0, 0],
+                             [0, 1, 0, 0], [0, 0, 1, 0]])
+        assert_almost_equal(evaluator.performance_table, expected)
+        for N in range(4):
+            evaluator = TopListEvaluator(labels, N=N)
+            assert_almost_equal(evaluator.performance,
+                                expected[N, evaluator.min_sup:
+                                         evaluator.max_sup+1])
@@ -0,0 +1,18 @@
+from nose.tools import assert_equal, assert_true
+from numpy.testing import assert_almost_equal
+import numpy as np
+from scipy.stats import hypergeom
+
+from otdet.evaluation import baseline_table
+
+
+class TestBaselineTable:
+    def test_default(self):
+        result = baseline_table(5, 2)
+        assert_equal(result.shape, (6, 3))
+        for N in range(6):
+            expected = hypergeom(5, 2, N).pmf(np.arange(3))
+            assert_almost_equal(result[N], expected)
+
+    def test_cached(self):
+        assert_true(baseline_table(7, 3) is baseline_table(7, 3))
@@ -0,0 +1,47 @@
+from nose.tools import assert_equal, raises
+import numpy as np
+
+from otdet.evaluation import rank_posts
+
+
+class TestRankPosts:
+    def setUp(self):
+        self.scores = [0.5, 2., 0.5, np.nan, 2., 1.]
+        self.is_oot = [True, False, False, False, True, False]
+
+    def test_default(self):
+        result = rank_posts(self.scores)
+        assert_equal(result.tolist(), [1, 4, 5, 0, 2, 3])
+
+    def test_worst(self):
+        result = rank_posts(self.scores, self.is_oot, ties='worst')
+        assert_equal(result.tolist(), [1, 4, 5, 2, 0, 3])
+
+    def test_best(self):
+        result = rank_posts(self.scores, self.is_oot, ties='best')
+        assert_equal(result.tolist(), [4, 1, 5, 0, 2, 3])
+
+    def test_random(self):
+        results = set()
+        for seed in range(20):
+            result = rank_posts(self.scores, ties='random',
+                                random_state=seed)
+            assert_equal(sorted(result[:2]), [1, 4])
+            assert_equal(result[2], 5)
+            results.add(tuple(result))
+        assert_equal(len(results), 4)
+        assert_equal(rank_posts(self.scores, ties='random',
+                                random_state=1).tolist(),
+                     rank_posts(self.scores, ties='random',
+                                random_state=1).tolist())
+
+    def test_experiments(self):
+        scores = np.array([self.scores, self.scores[::-1]])
+        is_oot = np.array([self.is_oot, self.is_oot[::-1]])
+        result = rank_posts(scores, is_oot)
+        assert_equal(result[0].tolist(), [1, 4, 5, 2, 0, 3])
+        assert_equal(result[1].tolist(), [4, 1, 0, 3, 5, 2])
+
+    @raises(Exception)
+    def test_invalid(self):
+        rank_posts(self.scores, ties='foo')
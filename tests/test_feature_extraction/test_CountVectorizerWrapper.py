@@ -0,0 +1,135 @@
+import os.path
+import shutil
+import tempfile
+from unittest.mock import Mock, patch
+
+from nose.tools import assert_equal, assert_true
+from numpy.testing import assert_almost_equal
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import CountVectorizer
+
+from otdet.cache import FeatureCache
+from otdet.feature_extraction import CountVectorizerWrapper
+
+
+class TestFitTransform:
+    def setUp(self):
+        self.documents = ['aa bb aa', 'bb cc']
+
+    def test_default(self):
+        extractor = CountVectorizerWrapper(input='content')
+        result = extractor.fit_transform(self.documents)
+        assert_true(isinstance(result, np.ndarray))
+        assert_almost_equal(result, np.array([[2, 1, 0], [0, 1, 1]]))
+
+    def test_sparse(self):
+        extractor = CountVectorizerWrapper(input='content', sparse=True)
+        result = extractor.fit_transform(self.documents)
+        assert_true(sp.isspmatrix_csr(result))
+        assert_almost_equal(result.toarray(), np.array([[2, 1, 0], [0, 1, 1]]))
+
+
+class TestFractionMaxFeatures:
+    def setUp(self):
+        self.documents = ['aa bb aa cc', 'bb cc dd aa']
+
+    def test_default(self):
+        extractor = CountVectorizerWrapper(input='content', max_features=0.5)
+        result = extractor.fit_transform(self.documents)
+        assert_almost_equal(result, np.array([[2, 1], [1, 1]]))
+        assert_equal(extractor.vocabulary_, {'aa': 0, 'bb': 1})
+        assert_equal(extractor.max_features, 0.5)
+
+    def test_same_as_count(self):
+        expected = CountVectorizerWrapper(
+            input='content', max_features=3).fit_transform(self.documents)
+        result = CountVectorizerWrapper(
+            input='content', max_features=0.75).fit_transform(self.documents)
+        assert_almost_equal(result, expected)
+
+    def test_transform(self):
+        extractor = CountVectorizerWrapper(input='content', max_features=0.5)
+        extractor.fit_transform(self.documents)
+        assert_almost_equal(extractor.transform(['dd aa cc aa']),
+                            np.array([[2, 0]]))
+
+
+class TestFitTransformCache:
+    def setUp(self):
+        self.dirname = tempfile.mkdtemp()
+        self.cache = FeatureCache(os.path.join(self.dirname, 'cache.db'))
+        self.documents = ['The aa bb aa', 'bb cc', 'aa bb aa']
+
+    def tearDown(self):
+        shutil.rmtree(self.dirname)
+
+    def test_default(self):
+        extractor = CountVectorizerWrapper(input='content',
+                                           stop_words='english')
+        expected = extractor.fit_transform(self.documents)
+        result = extractor.fit_transform(self.documents, cache=self.cache)
+        assert_almost_equal(result, expected)
+
+    def test_cached(self):
+        extractor = CountVectorizerWrapper(input='content', max_features=2)
+        expected = extractor.fit_transform(self.documents)
+        extractor.fit_transform(self.documents, cache=self.cache)
+        extractor = CountVectorizerWrapper(input='content', max_features=2)
+        mock_analyze = Mock()
+        with patch.object(CountVectorizer, 'build_analyzer',
+                          return_value=mock_analyze):
+            result = extractor.fit_transform(self.documents,
+                                             cache=self.cache)
+        assert_true(not mock_analyze.called)
+        assert_almost_equal(result, expected)
+
+
+class TestCacheNamespace:
+    def test_default(self):
+        namespace = CountVectorizerWrapper(input='content').cache_namespace
+        assert_equal(namespace,
+                     CountVectorizerWrapper(input='content').cache_namespace)
+
+    def test_callable(self):
+        extractor = CountVectorizerWrapper(input='content',
+                                           preprocessor=str.lower)
+        assert_true('0x' not in extractor.cache_namespace)
+        assert_true('str.lower' in extractor.cache_namespace)
+
+    def test_lambda(self):
+        extractor = CountVectorizerWrapper(input='content',
+                                           tokenizer=lambda doc: doc.split())
+        assert_equal(extractor.cache_namespace, None)
+
+    def test_lambda_not_cached(self):
+        dirname = tempfile.mkdtemp()
+        try:
+            cache = FeatureCache(os.path.join(dirname, 'cache.db'))
+            extractor = CountVectorizerWrapper(
+                input='content', tokenizer=lambda doc: doc.split())
+            result = extractor.fit_transform(['a b a', 'b c'], cache=cache)
+            assert_almost_equal(result, np.array([[2, 1, 0], [0, 1, 1]]))
+        finally:
+            shutil.rmtree(dirname)
+
+
+class TestTransform:
+    def test_sparse(self):
+        extractor = CountVectorizerWrapper(input='content', sparse=True)
+        extractor.fit(['aa bb aa', 'bb cc'])
+        result = extractor.transform(['cc cc dd'])
+        assert_true(sp.isspmatrix_csr(result))
+        assert_almost_equal(result.toarray(), np.array([[0, 0, 2]]))
+
+
+class TestIsSeparable:
+    def test_default(self):
+        assert_true(CountVectorizerWrapper().is_separable)
+
+    def test_limits(self):
+        for kwargs in [{'max_features': 10}, {'min_df': 2},
+                       {'min_df': 1.0}, {'max_df': 0.5}, {'max_df': 1},
+                       {'vocabulary': ['aa', 'bb']}]:
+            extractor = CountVectorizerWrapper(**kwargs)
+            assert_true(not extractor.is_separable)
@@ -0,0 +1,53 @@
+from nose.tools import assert_true, raises
+from numpy.testing import assert_almost_equal
+import scipy.sparse as sp
+
+from otdet.feature_extraction import CountVectorizerWrapper, \
+    PrecomputedCountVectorizer
+
+
+corpus = ['aa bb aa the', 'bb cc', 'cc dd dd dd ee', 'ff aa', 'ee ee bb']
+
+
+class TestFitTransform:
+    def test_default(self):
+        documents = [corpus[3], corpus[1], corpus[0]]
+        extractor = PrecomputedCountVectorizer(corpus, input='content',
+                                               stop_words='english')
+        expected = CountVectorizerWrapper(input='content',
+                                          stop_words='english')
+        expected = expected.fit_transform(documents)
+        assert_almost_equal(extractor.fit_transform(documents), expected)
+
+    def test_max_features(self):
+        documents = corpus[:3]
+        extractor = PrecomputedCountVectorizer(corpus, max_features=2)
+        expected = CountVectorizerWrapper(max_features=2)
+        expected = expected.fit_transform(documents)
+        assert_almost_equal(extractor.fit_transform(documents), expected)
+
+    def test_float_max_features(self):
+        documents = corpus[1:3]
+        extractor = PrecomputedCountVectorizer(corpus, max_features=0.5)
+        expected = CountVectorizerWrapper(max_features=2)
+        expected = expected.fit_transform(documents)
+        assert_almost_equal(extractor.fit_transform(documents), expected)
+
+    def test_sparse(self):
+        extractor = PrecomputedCountVectorizer(corpus, sparse=True,
+                                               stop_words='english')
+        result = extractor.fit_transform(corpus[:2])
+        assert_true(sp.isspmatrix_csr(result))
+        assert_almost_equal(result.toarray(), [[2, 1, 0], [0, 1, 1]])
+
+    @raises(Exception)
+    def test_not_in_corpus(self):
+        PrecomputedCountVectorizer(corpus).fit(['aa gg'])
+
+
+class TestTransform:
+    def test_not_in_corpus(self):
+        extractor = PrecomputedCountVectorizer(corpus,
+                                               stop_words='english')
+        extractor.fit(corpus[:2])
+        assert_almost_equal(extractor.transform(['cc aa gg cc']), [[1, 0, 2]])
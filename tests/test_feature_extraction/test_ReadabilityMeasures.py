@@ -1,9 +1,11 @@
 from unittest.mock import call, patch, Mock, MagicMock
 
 import numpy as np
+from nose.tools import assert_equal, assert_true, raises
 from numpy.testing import assert_almost_equal
 
 from otdet.feature_extraction import ReadabilityMeasures, TokenizedContent
+from otdet.syllables import SyllableTable
 
 
 class TestFitTransform:
@@ -18,31 +20,127 @@ class TestFitTransform:
         assert_almost_equal(extractor.fit_transform(self.documents), expected)
         mock_transform.assert_called_with(self.documents)
 
+    @patch.object(ReadabilityMeasures, 'transform')
+    def test_cache(self, mock_transform):
+        cached = {'First document.': np.array([1, 2])}
+        cache = Mock()
+        cache.features.side_effect = lambda ns, docs, func: \
+            [cached[doc] if doc in cached else func([doc])[0]
+             for doc in docs]
+        mock_transform.return_value = np.array([[3, 4]])
+        extractor = ReadabilityMeasures()
+        result = extractor.fit_transform(self.documents, cache=cache)
+        assert_almost_equal(result, np.array([[1, 2], [3, 4]]))
+        mock_transform.assert_called_once_with(['Second.\nDocument.\n'])
+
 
 @patch('otdet.feature_extraction.TokenizedContent')
-@patch.object(ReadabilityMeasures, '_to_vector')
+@patch.object(ReadabilityMeasures, 'counts')
 class TestTransform:
     def setUp(self):
         self.documents = ['aa aaab. aab. a.', 'aa.\n', 'aa.\naaab.\n\naa!!']
 
-    def test_default(self, mock_to_vector, MockTokenizedContent):
-        expected = [np.array([1, 2]), np.array([3, 4]), np.array([5, 6])]
+    def test_default(self, mock_counts, MockTokenizedContent):
+        counts = [np.array([30, 5, 100, 50, 5, 3]), np.arange(1, 7),
+                  np.array([4, 2, 10, 7, 1, 0])]
         MockTokenizedContent.side_effect = [Mock(), Mock(), Mock()]
-        mock_to_vector.side_effect = expected
+        mock_counts.side_effect = counts
         extractor = ReadabilityMeasures()
-        assert_almost_equal(extractor.transform(self.documents),
-                            np.array(expected))
-        calls = [call(doc, extractor.remove_punct) for doc in self.documents]
+        expected = extractor.evaluate(np.array(counts))
+        assert_almost_equal(extractor.transform(self.documents), expected)
+        calls = [call(doc.lower(), extractor.remove_punct)
+                 for doc in self.documents]
         MockTokenizedContent.assert_has_calls(calls)
         calls = [call(tok) for tok in MockTokenizedContent.side_effect]
-        mock_to_vector.assert_has_calls(calls)
+        mock_counts.assert_has_calls(calls)
 
-    def test_empty_content(self, mock_to_vector, MockTokenizedContent):
-        expected = [np.array([ReadabilityMeasures.INF])]
+    def test_empty_content(self, mock_counts, MockTokenizedContent):
         MockTokenizedContent.return_value = Mock()
-        mock_to_vector.side_effect = expected
+        mock_counts.return_value = np.zeros(6)
         extractor = ReadabilityMeasures()
-        assert_almost_equal(extractor.transform(['..']), np.array(expected))
+        expected = np.array([[ReadabilityMeasures.INF]*7])
+        assert_almost_equal(extractor.transform(['..']), expected)
+
+    def test_no_documents(self, mock_counts, MockTokenizedContent):
+        extractor = ReadabilityMeasures()
+        assert_equal(extractor.transform([]).shape, (0, 7))
+
+    @patch.object(ReadabilityMeasures, '_to_vector')
+    def test_custom_measure(self, mock_to_vector, mock_counts,
+                            MockTokenizedContent):
+        MockTokenizedContent.side_effect = [Mock(), Mock(), Mock()]
+        mock_to_vector.side_effect = [np.array([1]), np.array([2]),
+                                      np.array([3])]
+        extractor = ReadabilityMeasures(measures=['total_sylls'])
+        result = extractor.transform(self.documents)
+        assert_almost_equal(result, np.array([[1], [2], [3]]))
+        calls = [call(tok) for tok in MockTokenizedContent.side_effect]
+        mock_to_vector.assert_has_calls(calls)
+
+
+class TestInit:
+    @raises(Exception)
+    def test_invalid_oov(self):
+        ReadabilityMeasures(oov='guess')
+
+
+class TestTransformJobs:
+    @patch.object(ReadabilityMeasures, 'table', SyllableTable.from_dict({}))
+    @patch.object(ReadabilityMeasures, 'avg_syllables', return_value=1)
+    def test_default(self, mock_avg_syllables):
+        documents = ['aa aaab. aab. a.', 'aa.\n', 'aa.\naaab.\n\naa!!'] * 3
+        expected = ReadabilityMeasures().transform(documents)
+        result = ReadabilityMeasures(n_jobs=2).transform(documents)
+        assert_almost_equal(result, expected)
+
+
+class TestCounts:
+    @patch.object(ReadabilityMeasures, 'num_syllables')
+    def test_default(self, mock_num_syllables):
+        mock_num_syllables.side_effect = [1, 2, 3, 3, 3, 2, 1]
+        tokenized_content = [['aa', 'aaa', 'aa'], ['aa', 'aaaaaaa'],
+                             ['a', 'aaaaaa']]
+        result = ReadabilityMeasures.counts(tokenized_content)
+        assert_almost_equal(result, np.array([7, 3, 23, 15, 3, 2]))
+        calls = [call(w, 'average') for s in tokenized_content for w in s]
+        mock_num_syllables.assert_has_calls(calls)
+
+    @patch.object(ReadabilityMeasures, 'num_syllables', return_value=1)
+    def test_heuristic(self, mock_num_syllables):
+        ReadabilityMeasures.counts([['aa']], oov='heuristic')
+        mock_num_syllables.assert_called_with('aa', 'heuristic')
+
+    def test_empty(self):
+        assert_almost_equal(ReadabilityMeasures.counts([]), np.zeros(6))
+
+
+class TestEvaluate:
+    def test_default(self):
+        counts = np.array([[30, 5, 100, 50, 5, 3]])
+        expected = np.array([[59.745, 6.41666667, 22.66666667, 3.83283333,
+                              -2.72999999, 16, 8.47722557]])
+        result = ReadabilityMeasures().evaluate(counts)
+        assert_almost_equal(result, expected)
+
+    def test_partial_measures(self):
+        counts = np.array([[30, 5, 100, 50, 5, 3], [4, 2, 10, 7, 1, 0]])
+        extractor = ReadabilityMeasures(measures=['smog', 'ari'])
+        expected = ReadabilityMeasures().evaluate(counts)[:, [6, 4]]
+        assert_almost_equal(extractor.evaluate(counts), expected)
+
+    def test_zero_words(self):
+        counts = np.array([[0, 5, 0, 0, 0, 0]])
+        result = ReadabilityMeasures().evaluate(counts)
+        INF = ReadabilityMeasures.INF
+        expected = np.array([[INF, INF, INF, INF, INF, INF, 3]])
+        assert_almost_equal(result, expected)
+
+    def test_zero_sents(self):
+        counts = np.array([[30, 0, 100, 50, 5, 3]])
+        result = ReadabilityMeasures().evaluate(counts)
+        expected = ReadabilityMeasures.INF
+        assert_almost_equal(np.delete(result, 3), [expected]*6)
+        assert_almost_equal(result[0, 3], 3.83283333 + 0.3*5/3000)
 
 
 class TestToVector:
@@ -242,7 +340,7 @@ d = {
 }
 
 
-@patch.object(ReadabilityMeasures, 'd', d)
+@patch.object(ReadabilityMeasures, 'table', SyllableTable.from_dict(d))
 class TestNumSyllables:
     def test_word_exist_in_corpus(self):
         assert_almost_equal(ReadabilityMeasures.num_syllables('a'), 1.5)
@@ -256,8 +354,14 @@ class TestNumSyllables:
         assert_almost_equal(ReadabilityMeasures.num_syllables('f'), 5)
         mock_avg_syllables.assert_called_with(1)
 
+    @patch.object(ReadabilityMeasures, 'avg_syllables')
+    def test_heuristic(self, mock_avg_syllables):
+        result = ReadabilityMeasures.num_syllables('readable', 'heuristic')
+        assert_almost_equal(result, 3)
+        assert_true(not mock_avg_syllables.called)
+
 
-@patch.object(ReadabilityMeasures, 'd', d)
+@patch.object(ReadabilityMeasures, 'table', SyllableTable.from_dict(d))
 class TestAvgSyllables:
     def test_word_len_exist_in_corpus(self):
         assert_almost_equal(ReadabilityMeasures.avg_syllables(1), 7/6)
@@ -0,0 +1,52 @@
+import os
+import shutil
+import tempfile
+
+from nose.tools import assert_equal
+
+from otdet.journal import CrawlJournal
+
+
+class TestCrawlJournal:
+    def setUp(self):
+        self.dirname = tempfile.mkdtemp()
+        self.filename = os.path.join(self.dirname, 'journal.db')
+        self.journal = CrawlJournal(self.filename)
+
+    def tearDown(self):
+        shutil.rmtree(self.dirname)
+
+    def test_empty(self):
+        assert_equal(self.journal.page('http://a/1'), None)
+        assert_equal(self.journal.last_page('a'), None)
+        assert_equal(self.journal.number_posts('a', ['x', 'y']),
+                     [(0, 'x'), (1, 'y')])
+
+    def test_number_posts(self):
+        self.journal.commit('a', [(0, 'x'), (1, 'y')], [])
+        assert_equal(self.journal.number_posts('a', ['y', 'z', 'x', 'w']),
+                     [(2, 'z'), (3, 'w')])
+        # Posts are numbered per thread
+        assert_equal(self.journal.number_posts('b', ['y']), [(0, 'y')])
+
+    def test_duplicates(self):
+        assert_equal(self.journal.number_posts('a', ['x', 'y', 'x']),
+                     [(0, 'x'), (1, 'y')])
+
+    def test_not_committed(self):
+        self.journal.number_posts('a', ['x'])
+        assert_equal(self.journal.number_posts('a', ['x']), [(0, 'x')])
+
+    def test_pages(self):
+        self.journal.commit('a', [], [('http://a/1', 1, '"e"', None, 'h1'),
+                                      ('http://a/2', 2, None, 'Mon', 'h2')])
+        assert_equal(self.journal.page('http://a/1'), ('"e"', None, 'h1'))
+        assert_equal(self.journal.page('http://a/2'), (None, 'Mon', 'h2'))
+        assert_equal(self.journal.last_page('a'), 2)
+
+    def test_persistent(self):
+        self.journal.commit('a', [(0, 'x')], [('http://a/1', 1, None, None,
+                                               'h1')])
+        journal = CrawlJournal(self.filename)
+        assert_equal(journal.number_posts('a', ['x', 'y']), [(1, 'y')])
+        assert_equal(journal.last_page('a'), 1)
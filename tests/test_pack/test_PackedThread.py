@@ -0,0 +1,89 @@
+import os
+import os.path
+import pickle
+import shutil
+import tempfile
+
+from nose.tools import assert_equal, assert_false, assert_true, raises
+
+from otdet.pack import is_pack, PackedThread, write_pack
+
+
+class TestPackedThread:
+    def setUp(self):
+        self.dirname = tempfile.mkdtemp()
+        self.filename = os.path.join(self.dirname, 'thread.pack')
+        self.posts = ['first\n', 'sécond\n', '', 'fourth\nline\n']
+
+    def tearDown(self):
+        shutil.rmtree(self.dirname)
+
+    def test_default(self):
+        write_pack(self.filename, self.posts)
+        with PackedThread(self.filename) as thread:
+            assert_equal(len(thread), 4)
+            assert_equal(list(thread.numbers), [0, 1, 2, 3])
+            assert_equal(thread[1], 'sécond\n')
+            assert_equal(thread[-1], 'fourth\nline\n')
+            assert_equal(list(thread), self.posts)
+            assert_false(thread.compressed)
+
+    def test_compressed(self):
+        write_pack(self.filename, self.posts, compress=True)
+        with PackedThread(self.filename) as thread:
+            assert_true(thread.compressed)
+            assert_equal(list(thread), self.posts)
+
+    def test_numbers(self):
+        write_pack(self.filename, ['c', 'a', 'b'], numbers=[10, 0, 2])
+        with PackedThread(self.filename) as thread:
+            assert_equal(list(thread.numbers), [0, 2, 10])
+            assert_equal(thread.posts(), ('a', 'b', 'c'))
+            assert_equal(thread.posts(k=2), ('a', 'b'))
+
+    def test_empty(self):
+        write_pack(self.filename, [])
+        with PackedThread(self.filename) as thread:
+            assert_equal(len(thread), 0)
+            assert_equal(thread.posts(), ())
+
+    def test_mode(self):
+        write_pack(self.filename, self.posts)
+        other = os.path.join(self.dirname, 'other')
+        open(other, 'w').close()
+        assert_equal(os.stat(self.filename).st_mode,
+                     os.stat(other).st_mode)
+
+    def test_pickle(self):
+        write_pack(self.filename, self.posts)
+        with PackedThread(self.filename) as thread:
+            with pickle.loads(pickle.dumps(thread)) as copy:
+                assert_equal(list(copy), self.posts)
+
+    @raises(IndexError)
+    def test_out_of_range(self):
+        write_pack(self.filename, self.posts)
+        with PackedThread(self.filename) as thread:
+            thread[4]
+
+    @raises(Exception)
+    def test_wrong_numbers(self):
+        write_pack(self.filename, self.posts, numbers=[0, 1])
+
+    @raises(Exception)
+    def test_not_pack(self):
+        with open(self.filename, 'w') as f:
+            f.write('post')
+        PackedThread(self.filename)
+
+    def test_is_pack(self):
+        write_pack(self.filename, self.posts)
+        assert_true(is_pack(self.filename))
+        assert_false(is_pack(self.dirname))
+        textfile = os.path.join(self.dirname, 'post-0.txt')
+        with open(textfile, 'w') as f:
+            f.write('post')
+        assert_false(is_pack(textfile))
+        # No temporary file is left behind
+        assert_equal(sorted(os.listdir(self.dirname)),
+                     ['post-0.txt', 'thread.pack'])
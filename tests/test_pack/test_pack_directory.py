@@ -0,0 +1,53 @@
+import os.path
+import shutil
+import tempfile
+
+from unittest.mock import patch
+
+from nose.tools import assert_equal
+
+from otdet.corpus import Corpus
+from otdet.pack import pack_directory, PackedThread
+
+
+class TestPackDirectory:
+    def setUp(self):
+        self.dirname = tempfile.mkdtemp()
+        self.thread_dir = os.path.join(self.dirname, 'thread')
+        os.mkdir(self.thread_dir)
+        for i in [2, 0, 10, 1]:
+            filename = os.path.join(self.thread_dir, 'post-{}.txt'.format(i))
+            with open(filename, 'w') as f:
+                f.write('post {}\n'.format(i))
+        self.filename = os.path.join(self.dirname, 'thread.pack')
+
+    def tearDown(self):
+        shutil.rmtree(self.dirname)
+
+    def test_default(self):
+        pack_directory(self.thread_dir, self.filename)
+        with PackedThread(self.filename) as thread:
+            assert_equal(list(thread.numbers), [0, 1, 2, 10])
+            assert_equal(thread.posts(), ('post 0\n', 'post 1\n', 'post 2\n',
+                                          'post 10\n'))
+
+    def test_corpus(self):
+        pack_directory(self.thread_dir, self.filename, compress=True)
+        corpus = Corpus()
+        assert_equal(corpus.posts(self.filename, k=3),
+                     corpus.posts(self.thread_dir, k=3))
+        assert_equal(corpus.load(self.filename),
+                     corpus.load(self.thread_dir))
+
+    def test_corpus_lazy(self):
+        pack_directory(self.thread_dir, self.filename)
+        corpus = Corpus()
+        with patch.object(PackedThread, '__getitem__', autospec=True,
+                          side_effect=PackedThread.__getitem__) as get:
+            assert_equal(corpus.posts(self.filename, k=2),
+                         ('post 0\n', 'post 1\n'))
+            assert_equal(get.call_count, 2)
+            corpus.posts(self.filename, k=1)
+            assert_equal(get.call_count, 2)
+            assert_equal(len(corpus.posts(self.filename)), 4)
+            assert_equal(get.call_count, 4)
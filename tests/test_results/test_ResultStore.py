@@ -0,0 +1,46 @@
+import os
+import shutil
+import tempfile
+
+from nose.tools import assert_equal, assert_not_equal, assert_true
+from numpy.testing import assert_almost_equal
+import numpy as np
+
+from otdet.results import ResultStore
+
+
+class TestKey:
+    def test_default(self):
+        assert_equal(ResultStore.key(('a', 1, None)),
+                     ResultStore.key(('a', 1, None)))
+        assert_not_equal(ResultStore.key(('a', 1, None)),
+                         ResultStore.key(('a', 2, None)))
+
+
+class TestSaveLoad:
+    def setUp(self):
+        self.dirname = tempfile.mkdtemp()
+        self.store = ResultStore(os.path.join(self.dirname, 'results'))
+
+    def tearDown(self):
+        shutil.rmtree(self.dirname)
+
+    def test_default(self):
+        setting = ('clust_dist', 'unigram', 10)
+        assert_true(setting not in self.store)
+        self.store.save(setting, ranks=np.array([[2, 0, 1]]), min_sup=0)
+        assert_true(setting in self.store)
+        result = self.store.load(setting)
+        assert_equal(sorted(result), ['min_sup', 'ranks'])
+        assert_almost_equal(result['ranks'], [[2, 0, 1]])
+        assert_equal(int(result['min_sup']), 0)
+
+    def test_overwrite(self):
+        self.store.save('s', value=np.array([1.]))
+        self.store.save('s', value=np.array([2.]))
+        assert_almost_equal(self.store.load('s')['value'], [2.])
+
+    def test_no_temporary_files(self):
+        self.store.save('s', value=np.array([1.]))
+        assert_equal(os.listdir(self.store.dirname),
+                     [ResultStore.key('s') + '.npz'])
@@ -0,0 +1,146 @@
+import json
+import threading
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+from nose.tools import assert_equal, assert_true, raises
+from numpy.testing import assert_almost_equal
+import numpy as np
+from unittest.mock import Mock
+
+from otdet.detector import OOTDetector
+from otdet.server import ScoringServer, ScoringService
+
+
+threads = [['foo bar bar baz', 'foo bar', 'baz baz qux'],
+           ['qux foo quux', 'quux quux'],
+           ['bar baz', 'qux qux baz', 'foo', 'bar foo']]
+
+
+class TestScoringService:
+    def setUp(self):
+        self.detector = OOTDetector()
+        self.service = ScoringService(self.detector, max_delay=1)
+
+    def test_default(self):
+        futures = [self.service.submit(thread) for thread in threads]
+        self.service.start()
+        self.service.stop()
+        for thread, future in zip(threads, futures):
+            scores, batch_size = future.result()
+            assert_almost_equal(scores, self.detector.clust_dist(thread))
+            assert_equal(batch_size, 3)
+
+    def test_max_batch(self):
+        self.service.max_batch = 2
+        futures = [self.service.submit(thread) for thread in threads]
+        self.service.start()
+        self.service.stop()
+        batch_sizes = [future.result()[1] for future in futures]
+        assert_equal(batch_sizes, [2, 2, 1])
+
+    def test_method_metric(self):
+        future1 = self.service.submit(threads[0], 'mean_comp', 'cosine')
+        future2 = self.service.submit(threads[1])
+        self.service.start()
+        self.service.stop()
+        assert_almost_equal(future1.result()[0],
+                            self.detector.mean_comp(threads[0], 'cosine'))
+        assert_almost_equal(future2.result()[0],
+                            self.detector.clust_dist(threads[1]))
+
+    def test_error(self):
+        future1 = self.service.submit(threads[0])
+        future2 = self.service.submit(threads[1], metric='foo')
+        self.service.start()
+        self.service.stop()
+        assert_equal(len(future1.result()[0]), 3)
+        assert_true(future2.exception() is not None)
+
+    def test_error_first(self):
+        # A failing group does not fail the groups scored after it
+        future1 = self.service.submit(threads[1], metric='foo')
+        future2 = self.service.submit(threads[0], 'mean_comp', 'cosine')
+        future3 = self.service.submit(threads[2])
+        self.service.start()
+        self.service.stop()
+        assert_true(future1.exception() is not None)
+        assert_almost_equal(future2.result()[0],
+                            self.detector.mean_comp(threads[0], 'cosine'))
+        assert_almost_equal(future3.result()[0],
+                            self.detector.clust_dist(threads[2]))
+
+    def test_warm_up(self):
+        detector = Mock()
+        ScoringService(detector, metric='cosine').warm_up()
+        assert_true(detector.score_threads.called)
+
+
+class TestScoringServer:
+    def setUp(self):
+        self.detector = OOTDetector()
+        self.service = ScoringService(self.detector)
+        self.service.start()
+        self.server = ScoringServer(('127.0.0.1', 0), self.service,
+                                    quiet=True)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+        self.url = 'http://127.0.0.1:{}'.format(self.server.server_port)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        self.service.stop()
+
+    def post(self, obj, path='/score'):
+        data = json.dumps(obj).encode('utf-8')
+        request = Request(self.url + path, data=data,
+                          headers={'Content-Type': 'application/json'})
+        with urlopen(request) as response:
+            return json.loads(response.read().decode('utf-8'))
+
+    def test_score(self):
+        result = self.post({'posts': threads[0], 'metric': 'cosine'})
+        expected = self.detector.clust_dist(threads[0], 'cosine')
+        assert_equal([r['post'] for r in result['ranking']],
+                     list(np.argsort(-expected, kind='mergesort')))
+        assert_almost_equal([r['score'] for r in result['ranking']],
+                            np.sort(expected)[::-1])
+        assert_equal(result['batch_size'], 1)
+        assert_true(result['latency_ms'] > 0)
+
+    def test_top(self):
+        result = self.post({'posts': threads[2], 'top': 2})
+        assert_equal(len(result['ranking']), 2)
+
+    def test_concurrent(self):
+        results = [None]*len(threads)
+
+        def post(i):
+            results[i] = self.post({'posts': threads[i]})
+        clients = [threading.Thread(target=post, args=(i,))
+                   for i in range(len(threads))]
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+        for thread, result in zip(threads, results):
+            assert_equal(len(result['ranking']), len(thread))
+
+    def test_health(self):
+        with urlopen(self.url + '/health') as response:
+            assert_equal(json.loads(response.read().decode('utf-8')),
+                         {'status': 'ok'})
+
+    @raises(HTTPError)
+    def test_bad_request(self):
+        self.post({'posts': 'foo'})
+
+    @raises(HTTPError)
+    def test_bad_method(self):
+        self.post({'posts': threads[0], 'method': 'foo'})
+
+    @raises(HTTPError)
+    def test_not_found(self):
+        self.post({'posts': threads[0]}, path='/foo')
@@ -0,0 +1,81 @@
+import os.path
+
+from nose.tools import assert_equal, assert_true, raises
+
+from otdet.sites import ArchLinux, MovieForums, MusicBoards, \
+    PhysicsForums, ReligiousForums, SITES, Site
+
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+class TestPageUrl:
+    def test_default(self):
+        assert_equal(ArchLinux().page_url('42', 2),
+                     ('https://bbs.archlinux.org/viewtopic.php',
+                      {'id': '42', 'p': 2}))
+        assert_equal(PhysicsForums().page_url('foo.42', 3),
+                     ('https://www.physicsforums.com/threads/foo.42/page-3',
+                      None))
+
+    def test_base_url(self):
+        site = MusicBoards('http://localhost:8000/')
+        assert_equal(site.page_url('42', 1),
+                     ('http://localhost:8000/showthread.php/42/page1', None))
+
+
+class TestParse:
+    def test_archlinux(self):
+        html = ('<div class="postmsg"><p>Hello\n<b>world</b></p>'
+                '<p class="sig">skip</p><p>Bye</p></div>'
+                '<div class="postmsg other"><p>No</p></div>')
+        assert_equal(ArchLinux().parse(html), ['Hello\nworld\nBye\n'])
+
+    def test_movieforums(self):
+        html = ('<div id="post_message_1">Hi <i>there</i></div>'
+                '<div id="post_message_ad">Ad</div><div id="x">No</div>')
+        assert_equal(MovieForums().parse(html), ['Hi\nthere\n'])
+
+    def test_musicboards(self):
+        html = ('<blockquote class="postcontent restore">A</blockquote>'
+                '<blockquote class="postcontent lastedited">B</blockquote>')
+        assert_equal(MusicBoards().parse(html), ['A\n'])
+
+    def test_xenforo(self):
+        html = ('<blockquote class="messageText ugc">A <br/> B</blockquote>'
+                '<blockquote class="quote">C</blockquote>')
+        for site in [PhysicsForums(), ReligiousForums()]:
+            assert_equal(site.parse(html), ['A\nB\n'])
+
+
+class TestBackend:
+    def test_default(self):
+        assert_equal(PhysicsForums().backend, 'lxml')
+        assert_equal(PhysicsForums(backend='bs4').backend, 'bs4')
+
+    def test_no_xpath(self):
+        assert_equal(Site().backend, 'bs4')
+
+    @raises(Exception)
+    def test_unknown(self):
+        PhysicsForums(backend='html5lib')
+
+    def test_empty(self):
+        for backend in ['lxml', 'bs4']:
+            assert_equal(ArchLinux(backend=backend).parse(''), [])
+
+    def test_same_text(self):
+        for name, site in SITES.items():
+            filename = os.path.join(FIXTURES, '{}.html'.format(name))
+            with open(filename, encoding='utf-8') as f:
+                html = f.read()
+            posts = site(backend='bs4').parse(html)
+            assert_true(len(posts) > 0)
+            assert_equal(site(backend='lxml').parse(html), posts)
+
+
+class TestSites:
+    def test_default(self):
+        assert_equal(sorted(SITES), ['archlinux', 'movieforums',
+                                     'musicboards', 'physicsforums',
+                                     'religiousforums'])
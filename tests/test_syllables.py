@@ -0,0 +1,88 @@
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from nose.tools import assert_equal, assert_true, assert_is_none
+from numpy.testing import assert_almost_equal
+import numpy as np
+
+from otdet import syllables
+from otdet.syllables import SyllableTable, heuristic_syllables
+
+
+d = {
+    'a': [['a1', 'b', 'c'], ['a', 'b2', 'c1']],
+    'b': [['a2', 'b1']],
+    'c': [['a', 'b', 'c'], ['a']],
+    'ab': [['a', 'b1'], ['b2', 'c3']],
+    'caf\xe9': [['k', 'a1', 'f', 'e2']]
+}
+
+
+class TestSyllableTable:
+    def setUp(self):
+        self.table = SyllableTable.from_dict(d)
+
+    def test_get(self):
+        assert_almost_equal(self.table.get('a'), 1.5)
+        assert_almost_equal(self.table.get('c'), 0)
+        assert_almost_equal(self.table.get('ab'), 1.5)
+        assert_almost_equal(self.table.get('caf\xe9'), 2)
+
+    def test_not_found(self):
+        assert_is_none(self.table.get('aa'))
+        assert_is_none(self.table.get('0'))
+        assert_is_none(self.table.get('zzzzzzzzzzzzzzzz'))
+        assert_equal(self.table.get('d', 3), 3)
+
+    def test_contains(self):
+        assert_true('b' in self.table)
+        assert_true('d' not in self.table)
+        assert_equal(len(self.table), 5)
+
+    def test_average(self):
+        assert_almost_equal(self.table.average(1), 7/6)
+        assert_almost_equal(self.table.average(4), 2)
+        assert_almost_equal(self.table.average(3), 7/5)
+
+    def test_save_load(self):
+        dirname = tempfile.mkdtemp()
+        try:
+            self.table.save(dirname)
+            table = SyllableTable.load(dirname)
+            assert_true(isinstance(table.words, np.memmap))
+            for word in d:
+                assert_almost_equal(table.get(word), self.table.get(word))
+            assert_almost_equal(table.averages, self.table.averages)
+        finally:
+            shutil.rmtree(dirname)
+
+
+class TestHeuristicSyllables:
+    def test_default(self):
+        assert_equal(heuristic_syllables('readable'), 3)
+        assert_equal(heuristic_syllables('make'), 1)
+        assert_equal(heuristic_syllables('table'), 2)
+        assert_equal(heuristic_syllables('Queue'), 1)
+
+    def test_no_vowel(self):
+        assert_equal(heuristic_syllables('http'), 1)
+        assert_equal(heuristic_syllables('42'), 1)
+
+
+class TestDefaultTable:
+    def setUp(self):
+        syllables.default_table.cache_clear()
+        self.dirname = tempfile.mkdtemp()
+
+    def tearDown(self):
+        syllables.default_table.cache_clear()
+        shutil.rmtree(self.dirname)
+
+    def test_saved(self):
+        SyllableTable.from_dict(d).save(self.dirname)
+        with patch.dict(os.environ, {'OTDET_SYLLABLE_TABLE': self.dirname}):
+            table = syllables.default_table()
+        assert_equal(len(table), 5)
+        assert_true(isinstance(table.words, np.memmap))
@@ -1,4 +1,9 @@
-from otdet.util import pick
+import os.path
+import random
+import shutil
+import tempfile
+
+from otdet.util import pick, PostIndex, sample, stratified_sample
 
 from nose.tools import assert_equal, assert_true, raises
 
@@ -31,3 +36,98 @@ class TestPick():
     @raises(Exception)
     def test_negative_k(self):
         pick(self.filenames, k=-2)
+
+
+class TestPickNoMutation:
+    def setUp(self):
+        self.filenames = ['a-4.txt', 'b-2.txt', 'c-3.txt', 'd-1.txt',
+                          'e-0.txt']
+
+    def test_sequential(self):
+        pick(self.filenames, k=2, randomized=False)
+        assert_equal(self.filenames[0], 'a-4.txt')
+
+    def test_random(self):
+        filenames = list(self.filenames)
+        for _ in range(10):
+            pick(filenames, k=2)
+        assert_equal(filenames, self.filenames)
+
+    def test_seeded(self):
+        assert_equal(pick(self.filenames, k=3, random_state=7),
+                     pick(self.filenames, k=3, random_state=7))
+
+
+class TestSample:
+    def test_default(self):
+        result = sample(1000000, 5, random_state=1)
+        assert_equal(len(set(result)), 5)
+        assert_true(all(0 <= i < 1000000 for i in result))
+
+    def test_seeded(self):
+        assert_equal(sample(100, 10, random_state=3),
+                     sample(100, 10, random_state=3))
+        assert_equal(sample(100, 10, random_state=random.Random(3)),
+                     sample(100, 10, random_state=3))
+
+    def test_too_many(self):
+        assert_equal(sorted(sample(4, 10)), [0, 1, 2, 3])
+
+    @raises(Exception)
+    def test_negative_k(self):
+        sample(4, -1)
+
+
+class TestStratifiedSample:
+    def test_proportional(self):
+        result = stratified_sample([10, 30, 60], 10, random_state=0)
+        strata = [stratum for stratum, _ in result]
+        assert_equal(strata, [0]*1 + [1]*3 + [2]*6)
+        assert_equal(len(set(result)), 10)
+
+    def test_remainder(self):
+        # Shares are 1.5, 1.5 and 1, so the first two strata tie for the
+        # remaining post and the first wins
+        result = stratified_sample([3, 3, 2], 4, random_state=0)
+        assert_equal([stratum for stratum, _ in result], [0, 0, 1, 2])
+
+    def test_positions(self):
+        for stratum, position in stratified_sample([2, 5], 7):
+            assert_true(0 <= position < [2, 5][stratum])
+
+    def test_seeded(self):
+        assert_equal(stratified_sample([5, 7, 9], 6, random_state=2),
+                     stratified_sample([5, 7, 9], 6, random_state=2))
+
+    def test_empty(self):
+        assert_equal(stratified_sample([0, 0], 3), [])
+
+
+class TestPostIndex:
+    def setUp(self):
+        self.filenames = ['t/post-10.txt', 't/post-2.txt', 't/post-0.txt',
+                          't/post-1.txt']
+
+    def test_default(self):
+        index = PostIndex(self.filenames)
+        assert_equal(len(index), 4)
+        assert_equal(list(index.numbers), [0, 1, 2, 10])
+        assert_equal(index.first(2), ('t/post-0.txt', 't/post-1.txt'))
+
+    def test_sample(self):
+        index = PostIndex(self.filenames)
+        result = index.sample(3, random_state=5)
+        assert_equal(len(set(result)), 3)
+        assert_true(set(result) <= set(self.filenames))
+        assert_equal(result, index.sample(3, random_state=5))
+
+    def test_from_dir(self):
+        dirname = tempfile.mkdtemp()
+        try:
+            for i in [3, 1]:
+                path = os.path.join(dirname, 'post-{}.txt'.format(i))
+                open(path, 'w').close()
+            index = PostIndex.from_dir(dirname)
+            assert_equal(list(index.numbers), [1, 3])
+        finally:
+            shutil.rmtree(dirname)